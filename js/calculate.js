@@ -1,4 +1,7 @@
-document.getElementById('scoreForm').addEventListener('submit', function(event) {
+// 本地打分服务（python src/server.py）的地址；服务未启动时退回到按日期和字数的估算
+const scoringServiceUrl = 'http://127.0.0.1:8765/score';
+
+document.getElementById('scoreForm').addEventListener('submit', async function(event) {
     event.preventDefault();
 
     const title = document.getElementById('title').value;
@@ -35,6 +38,26 @@ document.getElementById('scoreForm').addEventListener('submit', function(event)
 
     // 构造完整的日期字符串
     const fullDate = `${year}-${month}-${day}`;
+
+    // 优先使用打分服务，返回完整的特征和模型预测的分数
+    try {
+        const response = await fetch(scoringServiceUrl, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ title: title, abstract: abstract, keywords: keywords, body: content, date: fullDate })
+        });
+        const result = await response.json();
+        if (response.ok && result.score !== null) {
+            const features = result.features;
+            document.getElementById('result').innerText =
+                `预测分数：${result.score.toFixed(1)}\n` +
+                `字数：${features.word_count}　主题相关度：${features.relevance_score.toFixed(4)}　平均句长：${features.syntax_complexity.toFixed(3)}`;
+            return;
+        }
+    } catch (error) {
+        // 打分服务不可用，使用下面的估算方法
+    }
+
     const dateInputObj = new Date(fullDate);
     const startDate = new Date('2022-09-01');
 
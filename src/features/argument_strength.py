@@ -1,42 +1,51 @@
 # src/features/argument_strength.py
 
-from collections import Counter
-from sklearn.decomposition import NMF
-from sklearn.feature_extraction.text import TfidfVectorizer
-import jieba
-import jieba.posseg
+import os
+import sys
+from functools import lru_cache
+import numpy as np
+
+# 直接运行本文件时也能导入utils
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from utils.automaton import KeywordAutomaton
+from utils.vocab import as_token_ids
 
 # 计算论文的论点强度
-def evaluate_argument_strength(tokens, sentences):
-    # 统计词频
-    token_counter = Counter(tokens)
+# tokens可以是词列表，也可以是预处理得到的token ID数组（此时需同时传入词表token_types）
+def evaluate_argument_strength(tokens, sentences, token_types=None):
+    token_ids, token_types = as_token_ids(tokens, token_types)
 
-    # 用set去重
-    unique_tokens = set(tokens)
+    # 统计词频：每个词的出现次数和第一次出现的位置
+    unique_ids, first_positions, counts = np.unique(token_ids, return_index=True, return_counts=True)
 
     # 这里的top_n是不重复词数量的1%
-    top_n = int(len(token_counter) * 0.01)
-    most_common = token_counter.most_common(top_n)  # 获取高频词
+    top_n = int(len(unique_ids) * 0.01)
+    # 获取高频词：按频次从高到低排序，频次相同时先出现的词在前（与Counter.most_common一致）
+    order = np.lexsort((first_positions, -counts))[:top_n]
 
     # 提取高频关键词
-    keywords = [word for word, _ in most_common]
+    keywords = [token_types[id] for id in unique_ids[order]]
 
     # 计算高频关键词的出现次数
-    keyword_frequency = sum(token_counter[keyword] for keyword in keywords)
+    keyword_frequency = int(counts[order].sum())
 
     # 计算关键词覆盖率
-    words_coverage_ratio = keyword_frequency / len(tokens) if len(tokens) > 0 else 0
+    words_coverage_ratio = keyword_frequency / len(token_ids) if len(token_ids) > 0 else 0
+
+    # 用关键词构建一次多模式匹配自动机，扫描一遍全文得到每个句子是否含有关键词
+    sentence_mask = KeywordAutomaton(keywords).sentence_mask(sentences)
 
     # 计算所有含有关键词的句子占总句子数的比例
-    sentence_coverage_ratio = sum(1 for sentence in sentences if any(keyword in sentence for keyword in keywords)) / len(sentences)
+    sentence_coverage_ratio = sum(sentence_mask) / len(sentences)
     # 计算所有含有关键词的句子占总字数的比例
-    passage_coverage_ratio = sum(len(sentence) for sentence in sentences if any(keyword in sentence for keyword in keywords)) / sum(len(sentence) for sentence in sentences)
+    passage_coverage_ratio = sum(len(sentence) for sentence, hit in zip(sentences, sentence_mask) if hit) / sum(len(sentence) for sentence in sentences)
 
     return keywords, words_coverage_ratio, sentence_coverage_ratio, passage_coverage_ratio
 
-from snownlp import SnowNLP
-
+# SnowNLP导入较慢（数秒），只在需要情感分析时才导入
 def analyze_argument_style(sentences):
+    from snownlp import SnowNLP
+
     argument_counts = [0, 0, 0, 0]  # [强支持, 弱支持, 强反对, 弱反对]
     sentiment_scores = []  # 用于保存每个句子的情感分数
 
@@ -60,10 +69,94 @@ def analyze_argument_style(sentences):
     
     return argument_counts, sentiment_scores_tuple  # 返回计数和情感分数元组
 
+##### 批量情感分析 #####
+# 把SnowNLP自带的朴素贝叶斯情感模型展开成矩阵：每个类别一行，每个词一列，值为该词在该类别下的对数概率，
+# 最后一列是未登录词的对数概率。模型每个进程只展开一次
+@lru_cache(maxsize=None)
+def load_sentiment_model():
+    from snownlp import sentiment
+    bayes = sentiment.classifier.classifier
+
+    classes = list(bayes.d)
+    vocabulary = {}
+    for prob in bayes.d.values():
+        for word in prob.samples():
+            vocabulary.setdefault(word, len(vocabulary))
+
+    log_probs = np.empty((len(classes), len(vocabulary) + 1))
+    log_priors = np.empty(len(classes))
+    for k, label in enumerate(classes):
+        prob = bayes.d[label]
+        log_probs[k, :] = np.log(prob.none / prob.getsum())
+        words = list(prob.samples())
+        log_probs[k, [vocabulary[word] for word in words]] = np.log([prob.d[word] / prob.getsum() for word in words])
+        log_priors[k] = np.log(prob.getsum()) - np.log(bayes.total)
+
+    return vocabulary, log_probs, log_priors, classes.index('pos')
+
+# 批量计算句子的情感分数（0到1，越大越积极），结果与 SnowNLP(sentence).sentiments 相同
+# sentence_tokens 为每句已经分好的词；不传时用SnowNLP自己的分词，传入时跳过分词，速度更快但分词方式不同
+def score_sentiments(sentences, sentence_tokens=None):
+    from snownlp import seg, normal
+    from scipy.sparse import csr_matrix
+    vocabulary, log_probs, log_priors, positive = load_sentiment_model()
+    unknown = len(vocabulary)
+
+    # 构建句子-词的计数矩阵（稀疏）
+    indices = []
+    indptr = [0]
+    segmented = {}  # 同一批中重复出现的句子只分词一次
+    for i, sentence in enumerate(sentences):
+        if sentence_tokens is not None:
+            words = sentence_tokens[i]
+        else:
+            words = segmented.get(sentence)
+            if words is None:
+                words = segmented[sentence] = seg.seg(sentence)
+        indices.extend(vocabulary.get(word, unknown) for word in normal.filter_stop(words))
+        indptr.append(len(indices))
+    counts = csr_matrix((np.ones(len(indices)), indices, indptr), shape=(len(sentences), unknown + 1))
+
+    # 每个句子在各类别下的对数后验，一次矩阵乘法得到
+    scores = counts @ log_probs.T + log_priors
+
+    # 转换成积极类别的后验概率；先减去最大值，避免指数溢出
+    scores -= scores.max(axis=1, keepdims=True)
+    probs = np.exp(scores)
+    return probs[:, positive] / probs.sum(axis=1)
+
+# 按情感分数把句子分为[强支持, 弱支持, 强反对, 弱反对]四类，分档规则与analyze_argument_style一致
+def count_argument_styles(sentiment_scores):
+    return [
+        int(np.count_nonzero(sentiment_scores >= 0.8)),
+        int(np.count_nonzero((sentiment_scores >= 0.5) & (sentiment_scores < 0.8))),
+        int(np.count_nonzero(sentiment_scores <= 0.2)),
+        int(np.count_nonzero((sentiment_scores > 0.2) & (sentiment_scores < 0.5)))
+    ]
+
+# analyze_argument_style的批量版本：一次处理多篇论文的全部句子
+# essays_sentences 为每篇论文的句子列表；essays_sentence_tokens 为对应的每句分词结果（可选）
+# 返回每篇论文的(论证风格计数, 情感分数元组)，与逐篇调用analyze_argument_style的结果相同
+def analyze_argument_style_batch(essays_sentences, essays_sentence_tokens=None):
+    all_sentences = [sentence for sentences in essays_sentences for sentence in sentences]
+    all_tokens = None
+    if essays_sentence_tokens is not None:
+        all_tokens = [tokens for sentence_tokens in essays_sentence_tokens for tokens in sentence_tokens]
+    all_scores = score_sentiments(all_sentences, all_tokens)
+
+    results = []
+    start = 0
+    for sentences in essays_sentences:
+        scores = all_scores[start:start + len(sentences)]
+        start += len(sentences)
+        results.append((count_argument_styles(scores), tuple(scores.tolist())))
+    return results
+
 # 以下为测试代码
 if __name__ == '__main__':
     sentences = ['一、《洛神赋》之情感简析', '文学作品的意蕴是文学作品结构的最深层次，它包含审美情韵、历史内容和哲学意涵三个维度，而这三个维度并不是平行排列的。', '文学作品所包含的情感与主旨不可混为一谈，但我们会看到历来论家对《洛神赋》的分析一贯遵循的思路是“主旨——情感”，即先确定曹植写作《洛神赋》的目的，以此作为预设来分析曹植所想要表达的情感。', '这条思路基于曹植自己所写的直接型“创作动机”（“感宋玉对楚王神女之事”）和未写在文本之中的曹植经历，初看起来是显性的；但这一想法本质上是两汉经学家“文以载道”（《通书·文辞》）想法的延续：儒家认为，文学作品必须有教育意义，要么批评现实，要么抒发内心情 感，歌颂也勉强可以被归入“寄托”之中。', '在我看来，这一观念是有待考量的。', '文学创作的整体过程中，第一位的便是产生创作动因，它包括创作动机和创作冲动。', '创作动机大致相当于通俗意义上的“创作目的”，这种内驱力是个体性因素和社会性因素的合力。', '但创作冲动在文学批评中却常常被忽略，这可能是因为创作冲动大多转瞬即逝、难以言明，限于知识水平古代评论家又很难对这种心理过程进行系统性描写。', '但恰恰是这种创作冲动推动着作家进行文学创作，而这种冲动又是与客观固有的明确创作动机相独立的。', '“无寄托说”亦是一种对《洛神赋》主旨的观点，但此处并非必须肯定或者否定“无寄托说”，而是先不去讨论曹植是否确有寄托，单论其在语词上所体现的情绪，并把文章的主旨视为对情绪归纳得出的结果。', '同时我们也应该看到《洛神赋》中另外一位主角洛神自身也是有情感波动的，这就与曹植自身的情感相映成趣。', '《洛神赋》全篇大致可分为六个段落，分别对应曹植和洛神不同的情感：', '曹植', '洛神', '1.还济洛川', '疲惫心烦', '（尚未出现）', '2.初见洛神', '惊为天人', '（恬然自得）', '3.心有所思', '振荡不怡', '4.犹豫狐疑', '犹豫迷茫', '5.互通心意', '矜持守礼', '心生爱慕', '悲伤痛苦', '6.永诀不见', '怅惘盘桓', '心系君王', '以上的分析仅仅来自于对文本抒情（包括直接抒情和间接抒情）的归纳。', '整个故事的主题是“人神之恋”，其中“楔子”部分洛神还没有出现（此处洛神的引入是通过“御者”完成的，但是其主要影响叙事结构，对整体的情感表达影响不大），描写洛神绝色的几段也并没有明确写洛神之情感。', '自“指潜渊而为期”开始，曹植方与洛神产生对话，文章中洛神之情感是曹植“托微波而通辞”之后才产生的。', '这样，至少就文本而言情感的产生就有了先后之分。', '作为情感产生主动的一方，曹植的情感是非常丰富的，“车殆马烦”之后的种种情感可以大致归为喜悦和悲伤两个侧面。']
     argument_counts, sentiment_scores = analyze_argument_style(sentences)
     print("论证风格计数:", argument_counts)  # 输出计数结果
     print("情感分数元组:", sentiment_scores)  # 输出情感分数元组
+    print("批量计算结果:", analyze_argument_style_batch([sentences])[0][0])
 
@@ -2,5 +2,5 @@
 
 def evaluate_coherence(tokens, coherence_words):
     # 这两个已经在preprocessed_data中定义了，这里直接调用即可
-    coherence_score = len(coherence_words) / len(tokens) if tokens else 0  # 计算连贯性得分
+    coherence_score = len(coherence_words) / len(tokens) if len(tokens) else 0  # 计算连贯性得分（tokens可以是列表或ID数组）
     return coherence_score
\ No newline at end of file
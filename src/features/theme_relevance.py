@@ -1,50 +1,89 @@
+import re
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import jieba  # 中文分词
-import logging  # 禁止jieba在终端打印building和loading信息
 
-def extract_keywords(sentence):
-    # 禁止jieba在终端打印building和loading信息
-    logging.getLogger('jieba').setLevel(logging.ERROR)
+# 查询与正文使用同一个分词入口（同一模型、同一份词典快照），两边切出的词才能对应
+def extract_keywords(sentence, model='jieba'):
+    from utils.preprocessing import tokenize
 
-    # 使用结巴分词提取关键信息
-    words = jieba.cut(sentence)
+    words = tokenize(sentence, model)
     return ' '.join(words)  # 用空格连接单词
 
-def evaluate_theme_relevance(title, keywords, sentences):
+# 与sklearn的TfidfVectorizer()默认设置相同的切词规则：转小写后取两个字符以上的词
+token_pattern = re.compile(r'(?u)\b\w\w+\b')
+
+# 计算查询与文档之间的TF-IDF余弦相似度，结果与 TfidfVectorizer().fit_transform(queries + documents) 后做矩阵乘法相同
+# （平滑idf、L2归一化）；直接用numpy实现，打分时不必导入sklearn
+def tfidf_similarities(queries, documents):
+    texts = queries + documents
+    vocabulary = {}
+    rows, columns = [], []
+    for i, text in enumerate(texts):
+        for term in token_pattern.findall(text.lower()):
+            rows.append(i)
+            columns.append(vocabulary.setdefault(term, len(vocabulary)))
+    if not vocabulary:
+        raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+
+    # 合并同一文档中重复的词，得到(文档, 词, 词频)
+    size = len(vocabulary)
+    cells, counts = np.unique(np.array(rows, dtype=np.int64) * size + np.array(columns, dtype=np.int64), return_counts=True)
+    rows, columns = cells // size, cells % size
+
+    document_frequency = np.bincount(columns, minlength=size)
+    idf = np.log((1 + len(texts)) / (1 + document_frequency)) + 1
+    weights = counts * idf[columns]
+    weights /= np.sqrt(np.bincount(rows, weights=weights * weights, minlength=len(texts)))[rows]
+
+    # 查询只有几条，展开成稠密矩阵；每个文档与各查询的点积按文档累加
+    num_queries = len(queries)
+    is_query = rows < num_queries
+    query_matrix = np.zeros((num_queries, size))
+    query_matrix[rows[is_query], columns[is_query]] = weights[is_query]
+
+    document_rows = rows[~is_query] - num_queries
+    products = query_matrix[:, columns[~is_query]] * weights[~is_query]
+    return np.array([np.bincount(document_rows, weights=product, minlength=len(documents)) for product in products]).reshape(num_queries, len(documents))
+
+# 计算一组查询（标题、摘要、关键词等）与正文每个句子的相似度
+# 整篇论文只计算一次TF-IDF，TF-IDF向量已做L2归一化，所以点积就是余弦相似度
+# 返回形状为(查询数, 句子数)的矩阵
+def query_sentence_similarities(queries, sentences, sentence_tokens=None, model='jieba'):
     # 提取关键信息
-    key_sentences = [extract_keywords(sentence) for sentence in sentences]
-    key_title = extract_keywords(title)
-
-    # 计算标题与每个句子的相似度
-    documents = [key_title] + key_sentences
-    vectorizer = TfidfVectorizer()
-    tfidf_matrix = vectorizer.fit_transform(documents)
-    similarity_matrix = cosine_similarity(tfidf_matrix)
-    
-    # 提取标题-句子相似度
-    title_sentence_similarities = similarity_matrix[0, 1:]  # 第一行是标题与所有句子的相似度
-
-    # 计算关键词与每个句子的相似度
-    keyword_similarities = []
-    for keyword in keywords:
-        keyword_vector = extract_keywords(keyword)
-        keyword_documents = [keyword_vector] + key_sentences
-        keyword_tfidf_matrix = vectorizer.fit_transform(keyword_documents)
-        keyword_similarity_matrix = cosine_similarity(keyword_tfidf_matrix)
-
-        # 提取关键词与句子的相似度
-        keyword_sentence_similarities = keyword_similarity_matrix[0, 1:]  # 获取关键词与所有句子的相似度
-        keyword_similarities.append(keyword_sentence_similarities)
-    
+    if sentence_tokens is not None:
+        key_sentences = [' '.join(tokens) for tokens in sentence_tokens]
+    else:
+        key_sentences = [extract_keywords(sentence, model) for sentence in sentences]
+    key_queries = [extract_keywords(query, model) for query in queries]
+
+    return tfidf_similarities(key_queries, key_sentences)
+
+# 取相似度最大的10%（至少1个）的平均值；没有句子时为NaN
+def top_similarity(similarities):
+    if len(similarities) == 0:
+        return np.nan
+    num_top = int(len(similarities) * 0.1) or 1  # 计算10%的数量，至少为1
+    top_scores = np.partition(similarities, -num_top)[-num_top:]  # 找到最大10%的相似度值
+    return np.mean(top_scores)
+
+# 一次计算标题、摘要和关键词与正文的相关度，返回(标题相似度, 摘要相似度, 关键词平均相似度)
+# sentence_tokens是预处理阶段已经切分好的每句词列表，传入时不再对正文重复分词；model为预处理使用的分词模型，查询用同一模型切分
+def score_theme_relevance(title, abstract, keywords, sentences, sentence_tokens=None, model='jieba'):
+    similarities = query_sentence_similarities([title, abstract] + list(keywords), sentences, sentence_tokens, model)
+
+    average_title_similarity = top_similarity(similarities[0])
+    average_abstract_similarity = top_similarity(similarities[1])
+
     # 计算关键词与句子的平均相似度
-    avg_keyword_similarities = np.mean(np.mean(keyword_similarities, axis=0))
+    avg_keyword_similarities = np.mean(similarities[2:])
+
+    return average_title_similarity, average_abstract_similarity, avg_keyword_similarities
+
+def evaluate_theme_relevance(title, keywords, sentences, sentence_tokens=None, model='jieba'):
+    similarities = query_sentence_similarities([title] + list(keywords), sentences, sentence_tokens, model)
 
-    # 计算标题-句子相似度的最大10%数据的平均值
-    num_top = int(len(title_sentence_similarities) * 0.1) or 1  # 计算10%的数量，至少为1
-    top_title_scores = np.sort(title_sentence_similarities)[-num_top:]  # 找到最大10%的相似度值
-    average_title_similarity = np.mean(top_title_scores)
+    # 标题-句子相似度的最大10%数据的平均值，以及关键词与句子的平均相似度
+    average_title_similarity = top_similarity(similarities[0])
+    avg_keyword_similarities = np.mean(similarities[1:])
 
     return average_title_similarity, avg_keyword_similarities
 
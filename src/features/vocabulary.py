@@ -1,32 +1,39 @@
 # src/features/vocabulary.py
 
+import os
+import sys
+import numpy as np
+
+# 直接运行本文件时也能导入utils
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from utils.vocab import as_token_ids
+
+# tokens可以是词列表，也可以是预处理得到的token ID数组
 def calculate_vocabulary_richness(tokens):
-    if not tokens:
+    if len(tokens) == 0:
         return 0
 
+    token_ids = as_token_ids(tokens)[0]
+
     # 计算词汇总数
-    total_tokens = len(tokens)
+    total_tokens = len(token_ids)
     # 计算词汇种类数
-    unique_tokens = len(set(tokens))
+    unique_tokens = len(np.unique(token_ids))
     ttr = unique_tokens / total_tokens
 
     # 计算标准化的词汇丰富度
-    sttr = 0
-    num_segments = 0  # 记录有效的分段数
-
-    # 按 1000 词一段的方式遍历 tokens，但是考虑到论文长度，改为500
-    for i in range(0, len(tokens) - len(tokens) % 500, 500):
-        sub_tokens = tokens[i:i + 500]  # 获取每 500 个词
-        sub_unique_tokens = set(sub_tokens)  # 获取唯一的词汇
-        sub_ttr = len(sub_unique_tokens) / len(sub_tokens)  # 计算该段的 TTR
-        sttr += sub_ttr
-        num_segments += 1  # 有效的分段数量
+    # 按 1000 词一段的方式遍历 tokens，但是考虑到论文长度，改为500；舍去最后不足500词的部分
+    segment_size = 500
+    num_segments = total_tokens // segment_size  # 记录有效的分段数
 
     # 如果有效分段数大于 0，则计算平均值
     if num_segments > 0:
-        sttr /= num_segments
+        # 每段一行，行内排序后相邻不同的位置数加一就是该段的词汇种类数
+        segments = np.sort(token_ids[:num_segments * segment_size].reshape(num_segments, segment_size), axis=1)
+        sub_unique_tokens = 1 + np.count_nonzero(np.diff(segments, axis=1), axis=1)
+        sttr = float(np.mean(sub_unique_tokens / segment_size))
     else:
         sttr = "null"  # 无效分段，返回 N/A
 
     # 返回标准化的词汇丰富度
-    return total_tokens, unique_tokens, ttr, sttr
\ No newline at end of file
+    return total_tokens, unique_tokens, ttr, sttr
@@ -1,11 +1,21 @@
 from tqdm import tqdm
-from utils.preprocessing import preprocess_in_advance, preprocess_data # 数据传输到预处理转换为字段
+from utils.preprocessing import load_data, iter_papers, iter_file_papers, warn_duplicate_ids, list_data_files, init_worker, preprocess_batch_worker, preprocess_chunksize, preload_segmenter, open_cache, open_corpus_store, cache_fingerprint # 数据传输到预处理转换为字段
+from utils.cache import record_digest
+from utils.manifest import ResultManifest
+from utils.sinks import Sink, MultiSink, open_sink
+from utils.parallel import parallel_map
+from utils import corpus_store
+from utils import profiling
+from utils.aggregate import FeatureTable, aggregate, aggregate_fields, suppressed_groups, group_keys
+from models.similarity import SimilarityIndex, essay_minhash, format_matches
 from features.vocabulary import calculate_vocabulary_richness
 from features.syntax import analyze_syntax_complexity
 from features.coherence import evaluate_coherence
-from features.theme_relevance import evaluate_theme_relevance
+from features.theme_relevance import score_theme_relevance
 from features.argument_strength import evaluate_argument_strength # analyze_keywords
-import warnings, os, sys
+import warnings, os, sys, argparse
+from functools import lru_cache
+import numpy as np
 
 # 忽略警告
 warnings.filterwarnings("ignore", category=RuntimeWarning)
@@ -14,26 +24,46 @@ warnings.filterwarnings("ignore", category=RuntimeWarning)
 data_directory = './data/raw/'
 stop_words_path = './dict/stopwords.txt'
 model_choice = 'jieba'
+cache_directory = './data/cache/'  # 预处理结果缓存目录
+cache_max_mb = 512  # 缓存大小上限（MB），超出后淘汰最久未使用的条目
+lda_num_topics = 5  # LDA主题数
+corpus_store_directory = './data/corpus/'  # 列式语料存储目录
+manifest_path = './data/results/manifest.json'  # 增量模式的清单（文件、论文哈希和结果行）
+similarity_index_path = './data/results/similarity.npz'  # 增量模式使用的近似重复检测索引
+near_duplicate_threshold = 0.5  # 估计的相似度不低于该值时视为近似重复
+near_duplicate_limit = 3  # 每篇论文最多列出的近似重复论文数
+cohort_salt = os.environ.get('COHORT_SALT', '')  # 作者群组哈希的盐，必须保密；未设置时不能按作者群组汇总
+num_cohorts = 8  # 作者群组数
+min_cohort_authors = 3  # 按作者群组汇总时，作者少于该人数的组不输出
+
+# 分组汇总中打印的特征及其在表格中的缩写
+summary_metrics = [('vocab_richness', 'STTR'), ('clause_density', 'Clause'), ('coherence_score', 'Co-R'), ('relevance_score', 'T-Re')]
+
+# 结果行的格式版本，extract_features的输出改变时需要加一，使增量清单中保存的结果失效
+feature_version = 2
+
+# 表格中标题和课程两列的宽度
+max_title_length = 36
+max_curriculum_length = 14
+
+# 写入CSV、JSONL、Parquet等文件的字段及类型（作者字段出于隐私保护不输出，与表格一致）
+output_fields = [
+    ('id', 'string'), ('title', 'string'), ('curriculum', 'string'), ('date', 'string'),
+    ('word_count', 'int'), ('vocab_richness', 'float'), ('realword_ratio', 'float'),
+    ('syntax_complexity', 'float'), ('clause_density', 'float'), ('coherence_score', 'float'),
+    ('frequencies_score', 'float'), ('relevance_score', 'float'), ('keyratio_score', 'float'),
+    ('near_duplicates', 'string'),
+]
+
+# 文本在终端中的显示宽度：码位大于255的字符（汉字、全角标点）占两格，破折号和中文引号占一格
+# 课程名等字段大量重复，所以缓存计算结果
+@lru_cache(maxsize=4096)
+def calculate_length(text):
+    wide = len(text) - len(text.encode('latin-1', errors='ignore'))
+    return len(text) + wide - text.count('—') - text.count('“') - text.count('”')
 
 # 打印表格
-def print_table_row(id, title, author, curriculum, date, word_count, vocab_richness, realword_ratio, syntax_complexity, clause_density, coherence_score, frequencies_score, relevance_score, keyratio_score):
-    global max_title_length, max_curriculum_length
-    max_title_length = 36
-    max_curriculum_length = 14
-    
-    # 表格打印辅助函数
-    def calculate_length(text):
-        length = 0
-        fullwidth_punctuations = ['！', '‘', '’', '（', '）', '《', '》', '，', '。', '、', '；', '：', '？']
-        for char in text:
-            if ord(char) > 255 or char in fullwidth_punctuations:  # Unicode或全角字符
-                length += 2
-            else:
-                length += 1 
-            if char == '—' or char == '“' or char == '”':
-                length += -1
-        return length
-    
+def print_table_row(id, title, author, curriculum, date, word_count, vocab_richness, realword_ratio, syntax_complexity, clause_density, coherence_score, frequencies_score, relevance_score, keyratio_score, near_duplicates=''):
     # 设置截断
     if calculate_length(title) > max_title_length:
         title = title[:max_title_length - 22] + "..."
@@ -55,6 +85,8 @@ def print_table_row(id, title, author, curriculum, date, word_count, vocab_richn
     realword_ratio_str = f"{realword_ratio:.4f}" if isinstance(realword_ratio, (float, int)) else realword_ratio
     # 如果syntax_complexity小于10，则保留3位小数后，在整个字符串最后加上"？"
     syntax_complexity_str = f"{syntax_complexity:.3f}?" if syntax_complexity < 10 else f"{syntax_complexity:.3f}"
+    # 表格中只显示最相似的一篇
+    near_duplicate_str = near_duplicates.split(';')[0] if near_duplicates else "-"
     return ("│" + str(id).center(2) + "│" +
           title + ' ' * spaces_after_title + "│" +  # author.center(3) + "│" + # 隐私保护暂时屏蔽字段
           date.center(10) + "│" +
@@ -67,7 +99,8 @@ def print_table_row(id, title, author, curriculum, date, word_count, vocab_richn
           f"{coherence_score:.4f}".center(8) + "│" +
           f"{frequencies_score:.4f}".center(8) + "│" +
           f"{relevance_score:.4f}".center(8) + "│" +
-          f"{keyratio_score:.4f}".center(8) + "│" )
+          f"{keyratio_score:.4f}".center(8) + "│" +
+          near_duplicate_str.center(8) + "│" )
 
 ################ 输出格式说明 #######
 # 【WC】字数：文章的总字数。
@@ -78,49 +111,336 @@ def print_table_row(id, title, author, curriculum, date, word_count, vocab_richn
 # 【RM-R】转述标记比例：文章中转述标记的比例，衡量观点引用等。
 # 【T-Re】主题相关度：文章主题相关度，即文章有多切题。
 # 【Str.】论证强度：文章强论证的整体幅度。
+# 【Dup】近似重复：与之前的论文（本次运行中排在前面的论文，或已保存的索引中的论文）最相似的一篇，格式为“ID:相似度”。
 ################ 输出格式说明 #######
 
-# 主函数
-def main():
-    enable_lda_analysis = False  # 是否启用LDA主题分析，默认关闭
-    preprocessed_essays = preprocess_data(data_directory, stop_words_path, model_choice, enable_lda_analysis)
+# 计算单篇论文的全部特征，返回一行结果（字段与print_table_row的参数一致）
+def extract_features(essay):
+    id = essay.id
+    sentences = essay.sentences
+
+    with profiling.stage('vocabulary_richness', id):
+        vocab_richness = calculate_vocabulary_richness(essay.token_ids)[3]
+    # vocab_density = calculate_vocabulary_density(essay.token_ids)
+    with profiling.stage('syntax_complexity', id):
+        syntax_complexity, clause_density = analyze_syntax_complexity(sentences)
+    # 复用预处理阶段的分词结果，标题、摘要和关键词一次算完
+    with profiling.stage('theme_relevance', id):
+        title_similarity, abstract_similarity, keyword_similarity = score_theme_relevance(essay.title, essay.abstract, essay.keywords, sentences, essay.sentence_tokens, model_choice)
+    relevance_score = (title_similarity + 10 * keyword_similarity)/2
+
+    with profiling.stage('argument_strength', id):
+        keywords, words_coverage_ratio, sentence_coverage_ratio, passage_coverage_ratio = evaluate_argument_strength(essay.token_ids, sentences, essay.token_types)
+    keyratio_score = sentence_coverage_ratio # 即evaluate_argument_strength返回值中的第3项
+
+    return {
+        'id': essay.id,
+        'title': essay.title,
+        'author': essay.author,
+        'curriculum': essay.curriculum,
+        'date': essay.date,
+        'word_count': essay.word_count,
+        'vocab_richness': vocab_richness,
+        'realword_ratio': essay.realword_ratio,
+        'syntax_complexity': syntax_complexity,
+        'clause_density': clause_density,
+        'coherence_score': essay.coherence_parameters[1],
+        'frequencies_score': essay.frequencies_counts[7],
+        'relevance_score': relevance_score,
+        'keyratio_score': keyratio_score
+    }
+
+# 计算一篇论文的全部特征，并附上供主进程做近似重复检测的MinHash签名
+def score_essay(essay):
+    with profiling.stage('features', essay.id):
+        row = extract_features(essay)
+    with profiling.stage('minhash', essay.id):
+        row['minhash'] = essay_minhash(essay)
+    return row
+
+# 在子进程中完成一批论文的预处理和特征计算（parallel_map的batched模式，HanLP整批分词）
+def score_worker(items):
+    return [score_essay(essay) for id, essay in preprocess_batch_worker(items)]
+
+# 开启LDA分析时使用：同时返回去除停用词后的token，供主进程构建语料级词袋
+def score_worker_with_tokens(items):
+    return [(score_essay(essay), essay.tokens) for id, essay in preprocess_batch_worker(items)]
+
+# 从列式语料存储中按下标读取论文（不需要预处理）
+def score_stored(index):
+    return score_essay(corpus_store.worker_essay(index))
+
+def score_stored_with_tokens(index):
+    essay = corpus_store.worker_essay(index)
+    return score_essay(essay), essay.tokens
+
+# 一边产出结果行，一边把每篇论文转换成词袋并更新语料级词典（只保留词袋，不保留token列表）
+def collect_bows(rows, dictionary, corpus):
+    for row, tokens in rows:
+        corpus.append(dictionary.doc2bow(tokens, allow_update=True))
+        yield row
+
+# 近似重复检测：按论文顺序，先在索引中查询与之相似的论文，再把这篇论文加入索引
+# 从增量清单中复用的结果行没有签名，其中已经有上一次的检测结果，原样产出
+def flag_near_duplicates(rows, index):
+    for row in rows:
+        if 'minhash' in row:
+            signature = row.pop('minhash')
+            id = str(row['id'])
+            with profiling.stage('near_duplicates', id):
+                matches = index.query(signature, near_duplicate_threshold, exclude=id, limit=near_duplicate_limit)
+                index.add(id, signature)
+            row['near_duplicates'] = format_matches(matches)
+        yield row
+
+# 读取保存的近似重复检测索引，不存在或已作废时新建一个
+def open_similarity_index(path):
+    fingerprint = cache_fingerprint(stop_words_path, model_choice)
+    index = SimilarityIndex.load(path, fingerprint) if path else None
+    return index if index is not None else SimilarityIndex(fingerprint)
+
+# 在整个语料上训练一个LDA模型并输出主题；可视化页面只在指定路径时生成
+def report_topics(dictionary, corpus, workers, lda_visualization_path=None):
+    from models.topics import train_topic_model, infer_topics, topic_keywords, save_visualization
+
+    print("正在训练语料级LDA主题模型...")
+    lda_model = train_topic_model(corpus, dictionary, lda_num_topics, workers=workers if workers > 1 else None)
+    distributions = infer_topics(lda_model, corpus)
+
+    # 每个主题的关键词，以及以该主题为主要主题的论文数
+    dominant_counts = np.bincount(distributions.argmax(axis=1), minlength=lda_num_topics) if len(distributions) else np.zeros(lda_num_topics, dtype=int)
+    for topic, count in zip(topic_keywords(lda_model), dominant_counts):
+        print(f"{topic}（{count}篇）")
+
+    if lda_visualization_path is not None:
+        save_visualization(lda_model, dictionary, corpus, lda_visualization_path)
+        print("LDA可视化结果已保存到", lda_visualization_path)
+
+# 分组汇总：对每一种分组方式做一次向量化的统计，写入aggregate_outputs中的各个文件，print_summary为True时打印摘要
+# 摘要中每项特征显示“均值 (中位数)”，组内没有可用的值时显示“-”
+def report_aggregates(feature_table, groupings, aggregate_outputs=(), print_summary=True):
+    # 各种分组方式写入同一组文件，字段取所有用到的键；不属于本组的键为空
+    used_keys = [key for key in group_keys if any(key in keys for keys in groupings)]
+    fields = aggregate_fields(used_keys, feature_table.metrics)
+    sinks = [open_sink(output, fields) for output in aggregate_outputs]
 
-    results = []
+    with MultiSink(sinks) as sink:
+        for keys in groupings:
+            with profiling.stage('aggregate'):
+                groups = aggregate(feature_table, keys)
+            for group in groups:
+                sink.write(group)
+            if print_summary:
+                print_summary_table(keys, groups, suppressed_groups(feature_table, keys))
+
+# suppressed为因作者人数不足而没有列出的(组数, 作者人数)
+def print_summary_table(keys, groups, suppressed=(0, 0)):
+    labels = [' / '.join(str(group[key]) if group[key] != '' else '-' for key in keys) for group in groups]
+    width = max([calculate_length(label) for label in labels] + [calculate_length(' / '.join(keys))])
+    cell = lambda value: "-" if value is None else f"{value:.4f}"
+
+    hidden = f"，另有 {suppressed[0]} 组因作者少于 {min_cohort_authors} 人未列出，涉及 {suppressed[1]} 位作者" if 'cohort' in keys else ''
+    print(f"按 {' / '.join(keys)} 分组汇总（{len(groups)} 组{hidden}）：")
+    print(' / '.join(keys) + ' ' * (width - calculate_length(' / '.join(keys))) + "│" + "N".center(6) + "│" +
+          "│".join(label.center(17) for _, label in summary_metrics))
+    for label, group in zip(labels, groups):
+        print(label + ' ' * (width - calculate_length(label)) + "│" + str(group['count']).center(6) + "│" +
+              "│".join(f"{cell(group[f'{metric}_mean'])} ({cell(group[f'{metric}_p50'])})".center(17) for metric, _ in summary_metrics))
+
+# 打印表头
+def print_table_header():
+    print("╭" + "─" * 2 + "┬" + "─" * max_title_length + "┬" + "─" * 10 + "┬" + "─" * max_curriculum_length + "┬" + "─" * 6 + "┬" + "─" * 8 + "┬" + "─" * 8 + "┬" + "─" * 8 + "┬" + "─" * 8 + "┬" + "─" * 8 + "┬" + "─" * 8 + "┬" + "─" * 8 + "┬" + "─" * 8 + "┬" + "─" * 8 + "╮")
+    print("│" + "ID".center(2) + "│" + "Title".center(max_title_length) + "│" + "Date".center(10) + "│" + "Curriculum".center(max_curriculum_length) + "│" + "WC".center(6) + "│" + "STTR".center(8) + "│" + "RW-R".center(8) + "│" + "SL".center(8) + "│" + "Clause".center(8) + "│" + "Co-R".center(8) + "│" + "RM-R".center(8) + "│" + "T-Re".center(8) + "│" + "Str.".center(8) + "│" + "Dup".center(8) + "│")
+    print("╞" + "═" * 2 + "╪" + "═" * max_title_length + "╪" + "═" * 10 + "╪" + "═" * max_curriculum_length + "╪" + "═" * 6 + "╪" + "═" * 8 + "╪" + "═" * 8 + "╪" + "═" * 8 + "╪" + "═" * 8 + "╪" + "═" * 8 + "╪" + "═" * 8 + "╪" + "═" * 8 + "╪" + "═" * 8 + "╪" + "═" * 8 + "╡")
+
+# 打印表格底部
+def print_table_footer():
+    print("╰" + "─" * 2 + "┴" + "─" * max_title_length + "┴" + "─" * 10 + "┴" + "─" * max_curriculum_length + "┴" + "─" * 6 + "┴" + "─" * 8 + "┴" + "─" * 8 + "┴" + "─" * 8 + "┴" + "─" * 8 + "┴" + "─" * 8 + "┴" + "─" * 8 + "┴" + "─" * 8 + "┴" + "─" * 8 + "┴" + "─" * 8 + "╯")
+
+# 表格输出
+# stream为True时每算完一篇立即打印一行；否则先保存格式化好的行，等进度条结束后再打印整个表格
+class TableSink(Sink):
+    def __init__(self, stream=False):
+        self.stream = stream
+        self.lines = []
+        if stream:
+            print_table_header()
+
+    def write(self, row):
+        line = print_table_row(**row)
+        if self.stream:
+            print(line, flush=True)
+        else:
+            self.lines.append(line)
+
+    def close(self):
+        if not self.stream:
+            print("特征计算完毕，详细结果如下：")
+            print_table_header()
+            for line in self.lines:
+                print(line)
+        print_table_footer()
+
+# 增量模式：扫描数据目录，只把新增或修改过的论文交给compute计算，其余论文直接复用清单中的结果行
+# 大小和修改时间都没变的XML文件不再解析；返回(按论文顺序产出结果行的生成器, 论文总数)，全部产出后更新清单
+# 近似重复检测的索引与清单配套：索引重建后清单随之作废，已删除的论文同时从索引中移除
+def incremental_rows(compute, index):
+    manifest = ResultManifest(manifest_path, f"r{feature_version}|{index.uid}|{cache_fingerprint(stop_words_path, model_choice)}")
+    data_dir = os.path.abspath(data_directory)
+    print("数据目录:", data_dir)
+    print("正在检查新增、修改和删除的论文...")
+
+    files = {}    # 本次的文件清单
+    slots = {}    # 论文ID -> 复用的结果行，需要重新计算时为None；同一ID出现多次时以最后一次为准（与load_data一致）
+    digests = {}  # 论文ID -> 内容哈希
+    owners = {}   # 论文ID -> 最后一次出现所在的文件
+    changed = {}  # 需要重新计算的论文 ID -> info
+    duplicates = []
+    with profiling.stage('scan'):
+        for filename in list_data_files(data_dir):
+            path = os.path.join(data_dir, filename)
+            stat = os.stat(path)
+            entries = manifest.unchanged_file(filename, stat)
+            if entries is None:
+                entries = []
+                for id, info in iter_file_papers(path):
+                    digest = record_digest(info)
+                    entries.append([id, digest])
+                    if manifest.lookup(id, digest) is None:
+                        changed[id] = info
+                    else:
+                        changed.pop(id, None)
+            else:
+                for id, digest in entries:
+                    changed.pop(id, None)
+            for id, digest in entries:
+                if id in owners:
+                    duplicates.append(id)
+                slots[id] = manifest.lookup(id, digest)
+                digests[id] = digest
+                owners[id] = filename
+            files[filename] = [stat.st_size, stat.st_mtime_ns, entries]
+
+        # 文件未变、但清单中的结果行属于同一ID的另一篇论文（例如后面的重复论文所在的文件已被删除）：重新解析这些文件取出论文
+        stale = {}
+        for id, row in slots.items():
+            if row is None and id not in changed:
+                stale.setdefault(owners[id], set()).add(id)
+        for filename, ids in stale.items():
+            for id, info in iter_file_papers(os.path.join(data_dir, filename)):
+                if id in ids:
+                    changed[id] = info
+    warn_duplicate_ids(duplicates)
+
+    added = sum(1 for id in changed if id not in manifest.papers)
+    removed = [id for id in manifest.papers if id not in slots]
+    for id in removed:
+        index.remove(id)
+    print(f"共 {len(slots)} 篇论文：新增 {added} 篇，修改 {len(changed) - added} 篇，删除 {len(removed)} 篇，未变 {len(slots) - len(changed)} 篇。")
+
+    def generate():
+        papers = {}
+        computed = compute((id, changed[id]) for id, row in slots.items() if row is None)
+        for id, row in slots.items():
+            if row is None:
+                row = next(computed)
+            papers[id] = [digests[id], row]
+            yield row
+        manifest.save(files, papers)
+
+    return generate(), len(slots)
+
+# 主函数
+# stream为True时边读边算：论文逐篇从XML流入，每算完一篇立即打印一行，不在内存中保留整个语料；
+# 此时重复的论文ID每次出现各输出一行（其他模式只保留一行，见utils.preprocessing.iter_papers）
+# lda为True时在整个语料上训练一个LDA主题模型
+# incremental为True时只计算新增或修改过的论文，其余结果从增量清单中读取（不能与lda同时使用）
+# outputs为输出文件列表（见utils.sinks.open_sink），table为False时不打印表格
+# similarity_path为近似重复检测索引的路径：先读取其中已有的论文（例如往届论文），运行结束后把本次的论文加入并保存；
+# 为None时索引只在本次运行中使用（增量模式下总是使用similarity_index_path）
+# use_store为True时从列式语料存储读取预处理结果，存储不存在或已过期时先生成；rebuild_store为True时重新生成（不能与incremental同时使用）
+# groupings为分组方式的列表（每种是utils.aggregate.group_keys中若干键的元组），结果写完后按每种方式分组汇总各项特征，
+# 汇总结果写入aggregate_outputs中的各个文件（格式同outputs），table为True时同时打印摘要
+def main(workers=1, use_cache=True, rebuild_cache=False, stream=False, lda=False, lda_visualization_path=None, incremental=False, outputs=(), table=True, similarity_path=None, use_store=False, rebuild_store=False, groupings=(), aggregate_outputs=()):
+    cache_dir = cache_directory if use_cache else None
     global processed_papers_count
     processed_papers_count = 0
-    print("论文数据已全部载入，正在计算特征...")
 
-    for id, data in tqdm(preprocessed_essays.items(), desc="Processing papers", unit="papers", bar_format='{l_bar}{bar:40}{r_bar}', ncols=100):
-        fields = ['title', 'author', 'curriculum', 'date', 'abstract', 'keywords', 'tokens', 'sentences', 'coherence_words', 'coherence_parameters', 'word_count', 'frequencies_counts', 'realword_ratio']
-        title, author, curriculum, date, abstract, keywords, tokens, sentences, coherence_words, coherence_parameters, word_count, frequencies_counts, realword_ratio = (data[field] for field in fields)
+    # 多进程时每个子进程各自加载一次停用词，jieba词典由主进程预先加载后与fork出的子进程共享；结果按输入顺序返回
+    # 开启性能分析时，子进程的计时事件随结果一起送回主进程
+    # 使用语料存储时，子进程各自打开存储的内存映射，只按下标取论文
+    if use_store:
+        with profiling.stage('load_data'):
+            store = open_corpus_store(data_directory, stop_words_path, model_choice, corpus_store_directory, workers, cache_dir, rebuild_store)
+        worker = score_stored_with_tokens if lda else score_stored
+        worker, initializer, initargs = profiling.wrap_worker(worker, corpus_store.init_worker, (store.path,))
+        chunksize, batched = 1, False
+    else:
+        worker = score_worker_with_tokens if lda else score_worker
+        worker, initializer, initargs = profiling.wrap_worker(worker, init_worker, (stop_words_path, model_choice, cache_dir, rebuild_cache, cache_max_mb * 1024 * 1024), batched=True)
+        chunksize, batched = preprocess_chunksize(model_choice), True
+    preload_segmenter(model_choice, workers)
+    compute = lambda items: profiling.collect(parallel_map(worker, items, workers, initializer=initializer, initargs=initargs, chunksize=chunksize, batched=batched))
 
-        vocab_richness = calculate_vocabulary_richness(tokens)[3]
-        # vocab_density = calculate_vocabulary_density(tokens)
-        syntax_complexity, clause_density = analyze_syntax_complexity(sentences)
-        relevance_score = (evaluate_theme_relevance(title, keywords, sentences)[0] + 10 * evaluate_theme_relevance(abstract, keywords, sentences)[1])/2
+    if incremental:
+        similarity_path = similarity_index_path
+    index = open_similarity_index(similarity_path)
+
+    total = None
+    if incremental:
+        rows, total = incremental_rows(compute, index)
+    elif use_store:
+        total = len(store)
+        print(f"已打开语料存储：{total} 篇论文，正在计算特征...")
+        rows = compute(range(total))
+    elif stream:
+        rows = compute(profiling.profile_iter('load_data', iter_papers(data_directory)))
+    else:
+        with profiling.stage('load_data'):
+            essays = load_data(data_directory)
+        total = len(essays)
+        print("论文数据已全部载入，正在计算特征...")
+        rows = compute(essays.items())
 
-        keywords, words_coverage_ratio, sentence_coverage_ratio, passage_coverage_ratio = evaluate_argument_strength(tokens, sentences)
-        keyratio_score = evaluate_argument_strength(tokens, sentences)[2] # 也就是words_coverage_ratio
+    if lda:
+        from gensim.corpora import Dictionary
+        dictionary = Dictionary()
+        corpus = []
+        rows = collect_bows(rows, dictionary, corpus)
+    rows = flag_near_duplicates(rows, index)
 
-        # 生成行数据并存储在列表中
-        result_row = print_table_row(id, title, author, curriculum, date, word_count, vocab_richness, realword_ratio, syntax_complexity, clause_density, coherence_parameters[1], frequencies_counts[7], relevance_score, keyratio_score)
-        results.append(result_row)
+    # 每篇论文的结果一算出来就写入各个输出
+    sinks = [open_sink(output, output_fields) for output in outputs]
+    if table:
+        sinks.insert(0, TableSink(stream))
+    if groupings:
+        feature_table = FeatureTable(salt=cohort_salt, num_cohorts=num_cohorts, min_cohort_authors=min_cohort_authors)
+        sinks.append(feature_table)
+    if not stream:
+        rows = tqdm(rows, total=total, desc="Processing papers", unit="papers", bar_format='{l_bar}{bar:40}{r_bar}', ncols=100)
 
-        # 处理的论文计数
-        processed_papers_count += 1
+    with MultiSink(sinks) as sink:
+        for row in rows:
+            with profiling.stage('write_results'):
+                sink.write(row)
 
-    # 打印表头
-    print("特征计算完毕，详细结果如下：")
-    print("╭" + "─" * 2 + "┬" + "─" * max_title_length + "┬" + "─" * 10 + "┬" + "─" * max_curriculum_length + "┬" + "─" * 6 + "┬" + "─" * 8 + "┬" + "─" * 8 + "┬" + "─" * 8 + "┬" + "─" * 8 + "┬" + "─" * 8 + "┬" + "─" * 8 + "┬" + "─" * 8 + "┬" + "─" * 8 + "╮")
-    print("│" + "ID".center(2) + "│" + "Title".center(max_title_length) + "│" + "Date".center(10) + "│" + "Curriculum".center(max_curriculum_length) + "│" + "WC".center(6) + "│" + "STTR".center(8) + "│" + "RW-R".center(8) + "│" + "SL".center(8) + "│" + "Clause".center(8) + "│" + "Co-R".center(8) + "│" + "RM-R".center(8) + "│" + "T-Re".center(8) + "│" + "Str.".center(8) + "│")
-    print("╞" + "═" * 2 + "╪" + "═" * max_title_length + "╪" + "═" * 10 + "╪" + "═" * max_curriculum_length + "╪" + "═" * 6 + "╪" + "═" * 8 + "╪" + "═" * 8 + "╪" + "═" * 8 + "╪" + "═" * 8 + "╪" + "═" * 8 + "╪" + "═" * 8 + "╪" + "═" * 8 + "╪" + "═" * 8 + "╡")
+            # 处理的论文计数
+            processed_papers_count += 1
 
-    # 打印所有结果行
-    for row in results:
-        print(row)
+    if groupings:
+        report_aggregates(feature_table, groupings, aggregate_outputs, table)
 
-    # 打印表格底部
-    print("╰" + "─" * 2 + "┴" + "─" * max_title_length + "┴" + "─" * 10 + "┴" + "─" * max_curriculum_length + "┴" + "─" * 6 + "┴" + "─" * 8 + "┴" + "─" * 8 + "┴" + "─" * 8 + "┴" + "─" * 8 + "┴" + "─" * 8 + "┴" + "─" * 8 + "┴" + "─" * 8 + "┴" + "─" * 8 + "╯")
+    if lda:
+        with profiling.stage('lda'):
+            report_topics(dictionary, corpus, workers, lda_visualization_path)
+
+    if similarity_path:
+        index.save(similarity_path)
+
+    # 缓存超过大小上限时淘汰最久未使用的条目
+    cache = open_cache(cache_dir, stop_words_path, model_choice, max_bytes=cache_max_mb * 1024 * 1024)
+    if cache is not None:
+        cache.evict()
 
 # 程序入口
 if __name__ == "__main__":
@@ -128,8 +448,66 @@ if __name__ == "__main__":
     import time
     start_time = time.time()
 
+    # 命令行参数
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=1, help="并行处理的进程数，0表示使用全部CPU核心")
+    parser.add_argument('--no-cache', action='store_true', help="不读取也不写入预处理缓存")
+    parser.add_argument('--rebuild-cache', action='store_true', help="忽略已有的预处理缓存，重新计算并覆盖")
+    parser.add_argument('--stream', action='store_true', help="流式处理：边读取边计算边输出，内存占用与语料大小无关")
+    parser.add_argument('--lda', action='store_true', help="在整个语料上训练LDA主题模型并输出主题")
+    parser.add_argument('--lda-vis', metavar='PATH', help="把LDA可视化结果保存为HTML（需同时指定--lda）")
+    parser.add_argument('-o', '--output', action='append', default=[], metavar='PATH', help="把结果逐篇写入文件，格式由扩展名决定（.csv、.jsonl、.parquet、.arrow），也可写成“格式:路径”；可多次指定")
+    parser.add_argument('--no-table', action='store_true', help="不在终端打印结果表格")
+    parser.add_argument('--incremental', action='store_true', help="增量模式：只计算新增或修改过的论文，其余复用上次的结果")
+    parser.add_argument('--corpus-store', action='store_true', help="从列式语料存储读取预处理结果（不存在或数据已改变时先生成），不再解析XML和分词")
+    parser.add_argument('--rebuild-store', action='store_true', help="重新生成列式语料存储（需同时指定--corpus-store）")
+    parser.add_argument('--similarity-index', metavar='PATH', help="近似重复检测索引：与其中已有的论文（例如往届论文）比较，并把本次的论文加入后保存")
+    parser.add_argument('--group-by', action='append', default=[], metavar='KEYS', help=f"按逗号分隔的键分组汇总各项特征（可用：{', '.join(group_keys)}），例如 curriculum,year；可多次指定")
+    parser.add_argument('--aggregate-output', action='append', default=[], metavar='PATH', help="把分组汇总结果写入文件，格式同 -o；可多次指定（需同时指定--group-by）")
+    parser.add_argument('--profile', action='store_true', help="统计各阶段和各特征函数的用时，并列出最慢的论文")
+    parser.add_argument('--profile-memory', action='store_true', help="性能分析时同时统计各阶段的内存分配（较慢）")
+    parser.add_argument('--profile-top', type=int, default=20, help="性能分析时列出的最慢论文篇数")
+    parser.add_argument('--profile-output', metavar='PREFIX', help="保存性能分析结果：PREFIX.prof（cProfile）、PREFIX.folded（火焰图）和PREFIX.jsonl（原始事件）")
+    args = parser.parse_args()
+    if args.incremental and args.lda:
+        parser.error("--incremental 不能与 --lda 同时使用")
+    if args.incremental and args.corpus_store:
+        parser.error("--incremental 不能与 --corpus-store 同时使用")
+    if args.rebuild_store and not args.corpus_store:
+        parser.error("--rebuild-store 需要同时指定 --corpus-store")
+    if args.lda_vis and not args.lda:
+        parser.error("--lda-vis 需要同时指定 --lda")
+    groupings = [tuple(key.strip() for key in value.split(',') if key.strip()) for value in args.group_by]
+    for keys in groupings:
+        unknown = [key for key in keys if key not in group_keys]
+        if unknown or not keys:
+            parser.error(f"--group-by 中有未知的分组键: {', '.join(unknown) or '（空）'}（可用：{', '.join(group_keys)}）")
+    if any('cohort' in keys for keys in groupings) and not cohort_salt:
+        parser.error("按作者群组（cohort）汇总需要通过环境变量 COHORT_SALT 设置一个不公开的盐")
+    if args.aggregate_output and not groupings:
+        parser.error("--aggregate-output 需要同时指定 --group-by")
+    if groupings and args.no_table and not args.aggregate_output:
+        parser.error("--group-by 与 --no-table 同时使用时没有任何输出，请同时指定 --aggregate-output")
+
+    profiler = None
+    if args.profile or args.profile_memory or args.profile_output:
+        profiler = profiling.enable(args.profile_memory)
+    # cProfile只能分析当前进程，多进程时子进程中的函数调用不在其中
+    if args.profile_output:
+        import cProfile
+        cprofiler = cProfile.Profile()
+        cprofiler.enable()
+
     # 运行主函数
-    main()
+    main(args.workers, not args.no_cache, args.rebuild_cache, args.stream, args.lda, args.lda_vis, args.incremental, args.output, not args.no_table, args.similarity_index, args.corpus_store, args.rebuild_store, groupings, args.aggregate_output)
+
+    if profiler is not None:
+        profiler.report(('preprocess', 'theme_relevance'), args.profile_top)
+    if args.profile_output:
+        cprofiler.disable()
+        cprofiler.dump_stats(args.profile_output + '.prof')
+        profiler.write_folded(args.profile_output + '.folded')
+        profiler.write_events(args.profile_output + '.jsonl')
 
     # 结束计时
     end_time = time.time()
@@ -0,0 +1,273 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+from scipy import sparse
+
+# 直接运行本文件时也能导入utils
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from utils.vocab import Vocabulary, intern_tokens
+from utils.cache import record_digest
+from utils.parallel import parallel_map
+from utils.preprocessing import iter_papers, init_worker, preprocess_batch_worker, preprocess_chunksize, preload_segmenter, load_stop_words, tokenize, cache_fingerprint
+
+# 语料级倒排索引，用于检索主题相近的论文
+# 正文去除停用词后的token（与预处理结果相同）按语料级词表编号，词频保存为 论文×词 的稀疏矩阵；
+# 矩阵按列压缩（CSC），每一列就是一个词的倒排表（出现该词的论文及词频）。
+# 另外保存每个词的IDF（平滑IDF，与sklearn的TfidfVectorizer相同）和每篇论文TF-IDF向量的L2范数。
+# 查询时只取查询词对应的几列倒排表做一次稀疏矩阵乘法，得到与所有论文的余弦相似度，再取前k篇。
+# 新增或修改的论文先放在待合并列表中，commit时一次性并入矩阵并重新计算IDF和范数。
+
+index_version = 1
+
+class InvertedIndex:
+    def __init__(self, fingerprint=''):
+        self.fingerprint = fingerprint
+        self.vocabulary = Vocabulary()
+        self.ids = []        # 行号 -> 论文ID
+        self.rows = {}       # 论文ID -> 行号
+        self.titles = []     # 行号 -> 标题（用于显示结果）
+        self.curricula = []  # 行号 -> 课程
+        self.digests = []    # 行号 -> 论文内容哈希，用于判断论文是否改变
+        self.postings = sparse.csc_matrix((0, 0), dtype=np.float32)  # 正文词频，每列是一个词的倒排表
+        self.queries = sparse.csr_matrix((0, 0), dtype=np.float32)   # 标题、关键词和摘要的词频，每行是一篇论文的查询向量
+        self.idf = np.zeros(0)
+        self.norms = np.zeros(0)
+        self.curriculum_array = np.zeros(0, dtype=object)
+        self._pending = {}   # 尚未并入矩阵的论文：论文ID -> (标题, 课程, 内容哈希, 正文词频, 查询词频)
+        self._removed = set()
+
+    def __len__(self):
+        return len(self.rows) + sum(1 for id in self._pending if id not in self.rows)
+
+    def __contains__(self, id):
+        return id in self._pending or (id in self.rows and id not in self._removed)
+
+    def digest(self, id):
+        if id in self._pending:
+            return self._pending[id][2]
+        if id in self.rows and id not in self._removed:
+            return self.digests[self.rows[id]]
+        return None
+
+    # 把token序列转换成(语料级词ID数组, 词频数组)
+    def _counts(self, token_types, token_ids):
+        if len(token_ids) == 0:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        terms, counts = np.unique(self.vocabulary.remap(token_types, token_ids), return_counts=True)
+        return terms, counts.astype(np.float32)
+
+    # 添加一篇论文（ID已经存在时替换）；token_types/token_ids为预处理得到的正文token，query_tokens为标题、关键词和摘要的token
+    def add(self, id, token_types, token_ids, query_tokens, title='', curriculum='', digest=''):
+        self._pending[id] = (title, curriculum, digest, self._counts(token_types, token_ids), self._counts(*intern_tokens(query_tokens)))
+        self._removed.discard(id)
+
+    def remove(self, id):
+        self._pending.pop(id, None)
+        if id in self.rows:
+            self._removed.add(id)
+
+    @staticmethod
+    def _stack(matrix, pieces, num_terms, format):
+        rows = np.repeat(np.arange(len(pieces)), [len(terms) for terms, counts in pieces])
+        columns = np.concatenate([terms for terms, counts in pieces]) if pieces else np.zeros(0, dtype=np.int32)
+        data = np.concatenate([counts for terms, counts in pieces]) if pieces else np.zeros(0, dtype=np.float32)
+        added = sparse.csr_matrix((data, (rows, columns)), shape=(len(pieces), num_terms), dtype=np.float32)
+        matrix = sparse.csr_matrix(matrix, dtype=np.float32)
+        matrix.resize(matrix.shape[0], num_terms)
+        return sparse.vstack([matrix, added], format=format)
+
+    # 把待合并的论文并入矩阵，删除已移除或被替换的行，并重新计算IDF和范数
+    def commit(self):
+        if not self._pending and not self._removed:
+            return
+        num_terms = len(self.vocabulary)
+        keep = [row for row, id in enumerate(self.ids) if id not in self._removed and id not in self._pending]
+        postings = sparse.csr_matrix(self.postings)[keep]
+        queries = sparse.csr_matrix(self.queries)[keep]
+
+        ids = [self.ids[row] for row in keep] + list(self._pending)
+        entries = list(self._pending.values())
+        self.titles = [self.titles[row] for row in keep] + [entry[0] for entry in entries]
+        self.curricula = [self.curricula[row] for row in keep] + [entry[1] for entry in entries]
+        self.digests = [self.digests[row] for row in keep] + [entry[2] for entry in entries]
+        self.postings = self._stack(postings, [entry[3] for entry in entries], num_terms, 'csc')
+        self.queries = self._stack(queries, [entry[4] for entry in entries], num_terms, 'csr')
+        self.ids = ids
+        self.rows = {id: row for row, id in enumerate(ids)}
+        self._pending = {}
+        self._removed = set()
+        self._update_weights()
+
+    def _update_weights(self):
+        num_documents = self.postings.shape[0]
+        document_frequency = np.diff(self.postings.indptr)
+        self.idf = np.log((1 + num_documents) / (1 + document_frequency)) + 1
+        self.norms = np.sqrt(self.postings.power(2) @ (self.idf ** 2))
+        self.curriculum_array = np.array(self.curricula, dtype=object)
+
+    # 由查询词频计算与每篇论文的余弦相似度，只读取查询词的倒排表
+    def _scores(self, terms, counts):
+        idf = self.idf[terms]
+        weights = counts * idf
+        query_norm = np.sqrt(np.dot(weights, weights))
+        if query_norm == 0:
+            return None
+        dot = self.postings[:, terms] @ (weights * idf)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = dot / (self.norms * query_norm)
+        return np.nan_to_num(scores, copy=False)
+
+    def _top(self, scores, k, curriculum=None, exclude=None):
+        if scores is None:
+            return []
+        if curriculum is not None:
+            scores = np.where(self.curriculum_array == curriculum, scores, 0)
+        if exclude is not None and exclude in self.rows:
+            scores[self.rows[exclude]] = 0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+        return [(self.ids[row], float(scores[row])) for row in candidates]
+
+    # 按一组token检索，返回前k篇[(论文ID, 相似度), ...]；curriculum不为None时只在该课程中检索
+    def query(self, tokens, k=10, curriculum=None, exclude=None):
+        self.commit()
+        terms = [self.vocabulary.index[token] for token in tokens if token in self.vocabulary.index]
+        if not terms:
+            return []
+        terms, counts = np.unique(np.array(terms, dtype=np.int32), return_counts=True)
+        return self._top(self._scores(terms, counts.astype(np.float32)), k, curriculum, exclude)
+
+    # 以一篇已收录论文的标题、关键词和摘要为查询，返回与之主题相近的其他论文；same_curriculum为True时只在同一课程中检索
+    def related(self, id, k=10, same_curriculum=True):
+        self.commit()
+        if id not in self.rows:
+            raise KeyError(f"索引中没有论文 {id}")
+        row = self.rows[id]
+        start, end = self.queries.indptr[row], self.queries.indptr[row + 1]
+        scores = self._scores(self.queries.indices[start:end], self.queries.data[start:end])
+        return self._top(scores, k, self.curricula[row] if same_curriculum else None, exclude=id)
+
+    def title(self, id):
+        return self.titles[self.rows[id]]
+
+    # 保存为.npz；先写临时文件再替换，避免留下写了一半的索引
+    def save(self, path):
+        self.commit()
+        path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        meta = {'version': index_version, 'fingerprint': self.fingerprint}
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.savez(
+                f,
+                meta=np.array(json.dumps(meta)),
+                words=np.array(self.vocabulary.words, dtype=str),
+                ids=np.array(self.ids, dtype=str),
+                titles=np.array(self.titles, dtype=str),
+                curricula=np.array(self.curricula, dtype=str),
+                digests=np.array(self.digests, dtype=str),
+                postings_data=self.postings.data, postings_indices=self.postings.indices, postings_indptr=self.postings.indptr, postings_shape=np.array(self.postings.shape),
+                queries_data=self.queries.data, queries_indices=self.queries.indices, queries_indptr=self.queries.indptr, queries_shape=np.array(self.queries.shape),
+            )
+        os.replace(temp_path, path)
+
+    # 读取保存的索引；文件不存在、无法读取或fingerprint不一致时返回None
+    @classmethod
+    def load(cls, path, fingerprint=''):
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                if meta.get('version') != index_version or meta.get('fingerprint') != fingerprint:
+                    print("计算环境已改变，倒排索引作废，将重新建立。")
+                    return None
+                index = cls(fingerprint)
+                index.vocabulary = Vocabulary(data['words'].tolist())
+                index.ids = data['ids'].tolist()
+                index.titles = data['titles'].tolist()
+                index.curricula = data['curricula'].tolist()
+                index.digests = data['digests'].tolist()
+                index.postings = sparse.csc_matrix((data['postings_data'], data['postings_indices'], data['postings_indptr']), shape=tuple(data['postings_shape']))
+                index.queries = sparse.csr_matrix((data['queries_data'], data['queries_indices'], data['queries_indptr']), shape=tuple(data['queries_shape']))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"倒排索引 '{path}' 无法读取，将重新建立: {e}")
+            return None
+        index.rows = {id: row for row, id in enumerate(index.ids)}
+        index._update_weights()
+        return index
+
+# 查询文字分词后去除停用词
+def text_query_tokens(text, stop_words, model):
+    return [token.strip() for token in tokenize(text, model) if token.strip() and token.strip() not in stop_words]
+
+# 论文的查询token：标题、关键词和摘要
+def essay_query_tokens(essay, stop_words, model):
+    return text_query_tokens(' '.join([essay.title or '', ' '.join(essay.keywords), essay.abstract or '']), stop_words, model)
+
+# 用数据目录中的论文更新索引：只预处理新增或内容改变的论文，已不在数据目录中的论文从索引中移除
+def update_index(index, data_dir, stop_words_file, model, workers=1, cache_dir=None):
+    seen = set()
+    digests = {}
+    changed = []
+    for id, info in iter_papers(data_dir):
+        seen.add(id)
+        digest = record_digest(info)
+        if index.digest(id) != digest:
+            digests[id] = digest
+            changed.append((id, info))
+    removed = [id for id in index.rows if id not in seen]
+    for id in removed:
+        index.remove(id)
+
+    stop_words = load_stop_words(stop_words_file)
+    preload_segmenter(model, workers)
+    for id, essay in parallel_map(preprocess_batch_worker, changed, workers, initializer=init_worker, initargs=(stop_words_file, model, cache_dir), chunksize=preprocess_chunksize(model, 8), batched=True):
+        index.add(id, essay.token_types, essay.token_ids, essay_query_tokens(essay, stop_words, model), essay.title, essay.curriculum, digests[id])
+    index.commit()
+    print(f"倒排索引共 {len(index)} 篇论文：更新 {len(changed)} 篇，移除 {len(removed)} 篇。")
+    return index
+
+def open_index(path, stop_words_file, model, rebuild=False):
+    fingerprint = f"i{index_version}|{cache_fingerprint(stop_words_file, model)}"
+    index = None if rebuild else InvertedIndex.load(path, fingerprint)
+    return index if index is not None else InvertedIndex(fingerprint)
+
+if __name__ == "__main__":
+    # 与main.py相同，路径相对于仓库根目录
+    data_directory = './data/raw/'
+    stop_words_path = './dict/stopwords.txt'
+    cache_directory = './data/cache/'
+    index_path = './data/results/inverted_index.npz'
+    model_choice = 'jieba'
+
+    parser = argparse.ArgumentParser(description="检索与某篇论文或一段文字主题相近的论文")
+    parser.add_argument('--id', help="以该论文的标题、关键词和摘要为查询")
+    parser.add_argument('--query', help="以一段文字为查询")
+    parser.add_argument('--top', type=int, default=10, help="返回的论文篇数")
+    parser.add_argument('--all-curricula', action='store_true', help="在全部课程中检索（默认只检索同一课程的论文）")
+    parser.add_argument('--curriculum', help="以文字查询时只检索该课程的论文")
+    parser.add_argument('--workers', type=int, default=1, help="预处理新论文的进程数，0表示使用全部CPU核心")
+    parser.add_argument('--rebuild', action='store_true', help="忽略已保存的索引，重新建立")
+    args = parser.parse_args()
+
+    index = open_index(index_path, stop_words_path, model_choice, args.rebuild)
+    update_index(index, data_directory, stop_words_path, model_choice, args.workers, cache_directory)
+    index.save(index_path)
+
+    if args.id is not None:
+        results = index.related(args.id, args.top, not args.all_curricula)
+        print(f"与论文 {args.id}（{index.title(args.id)}）主题相近的论文：")
+    elif args.query is not None:
+        tokens = text_query_tokens(args.query, load_stop_words(stop_words_path), model_choice)
+        results = index.query(tokens, args.top, args.curriculum)
+        print(f"与“{args.query}”主题相近的论文：")
+    else:
+        sys.exit(0)
+
+    for rank, (id, score) in enumerate(results, 1):
+        print(f"{rank:>3}. [{id}] {index.title(id)}（相似度 {score:.4f}）")
@@ -0,0 +1,179 @@
+import os
+import json
+import uuid
+import zlib
+from functools import lru_cache
+import numpy as np
+
+# 语料级近似重复检测（MinHash + LSH）
+# 每篇论文取去除停用词后的token序列，以连续shingle_size个token为一个shingle，用num_perm个哈希函数计算MinHash签名；
+# 两篇论文签名中相同分量的比例即其shingle集合Jaccard相似度的估计值。
+# 签名按bands段分桶（LSH），只有至少一段完全相同的论文才会成为候选，查询时不必与索引中的每篇论文比较。
+# 候选率约在相似度 (1/bands)^(1/rows) 附近陡增，默认128个哈希函数分为32段时约为0.42，再用签名估计的相似度按阈值筛选。
+
+num_perm = 128  # 哈希函数的个数（签名长度）
+bands = 32  # LSH的段数，每段 num_perm // bands 个分量
+shingle_size = 5  # 每个shingle包含的token数
+seed = 1  # 哈希函数的随机种子；改变后已保存的签名全部失效
+threshold = 0.5  # 估计的相似度不低于该值才算近似重复
+
+_shift32 = np.uint64(32)
+
+# MinHash使用的哈希函数：h(x) = ((a * x + b) mod 2^64) >> 32，a为奇数
+@lru_cache(maxsize=8)
+def _permutations(num_perm, seed):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+    return a[:, None], b[:, None]
+
+# 由token的ID序列和词表计算所有shingle的64位哈希（去重）
+# 每个词的哈希用crc32计算，与进程无关，保存的签名在之后的运行中仍然可以比较
+# 只对本篇实际出现的词计算哈希：token_types可以是整个语料的词表（例如语料存储中的StringTable）
+def shingle_hashes(token_ids, token_types, size=shingle_size):
+    if len(token_ids) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    used, inverse = np.unique(np.asarray(token_ids), return_inverse=True)
+    type_hashes = np.array([zlib.crc32(token_types[id].encode('utf-8')) for id in used.tolist()], dtype=np.uint64)
+    hashes = type_hashes[inverse.reshape(-1)]
+    size = min(size, len(hashes))
+
+    # 多项式滚动哈希，按2^64取模（numpy的无符号整数运算自然溢出）
+    count = len(hashes) - size + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        shingles = shingles * np.uint64(0x100000001B3) + hashes[offset:offset + count]
+    return np.unique(shingles)
+
+# 计算MinHash签名；没有任何shingle时返回None
+def minhash(token_ids, token_types, num_perm=num_perm, shingle_size=shingle_size, seed=seed):
+    shingles = shingle_hashes(token_ids, token_types, shingle_size)
+    if len(shingles) == 0:
+        return None
+    a, b = _permutations(num_perm, seed)
+    return ((a * shingles[None, :] + b) >> _shift32).min(axis=1).astype(np.uint32)
+
+def essay_minhash(essay):
+    return minhash(essay.token_ids, essay.token_types)
+
+# 签名的相似度：相同分量的比例
+def estimate_similarity(signature, other):
+    return float(np.count_nonzero(signature == other)) / len(signature)
+
+# LSH索引：论文ID -> 签名，以及每一段的桶（段内容 -> 论文ID集合）
+# 可以逐篇add、remove，保存后在下一次运行中继续添加（例如往届论文）
+# fingerprint描述签名所依赖的环境（预处理、分词等），与保存的索引不一致时load返回None
+class SimilarityIndex:
+    version = 1
+
+    def __init__(self, fingerprint='', num_perm=num_perm, bands=bands, shingle_size=shingle_size, seed=seed):
+        if num_perm % bands:
+            raise ValueError("num_perm必须是bands的整数倍")
+        self.fingerprint = fingerprint
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.seed = seed
+        self.uid = uuid.uuid4().hex  # 索引的标识，索引重建后依赖它的增量清单随之失效
+        self.signatures = {}
+        self.buckets = [{} for _ in range(bands)]
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def __contains__(self, id):
+        return id in self.signatures
+
+    def _keys(self, signature):
+        rows = self.rows
+        return [signature[band * rows:(band + 1) * rows].tobytes() for band in range(self.bands)]
+
+    def signature(self, token_ids, token_types):
+        return minhash(token_ids, token_types, self.num_perm, self.shingle_size, self.seed)
+
+    # 添加一篇论文；ID已经存在时替换原来的签名
+    def add(self, id, signature):
+        if id in self.signatures:
+            self.remove(id)
+        if signature is None:
+            return
+        self.signatures[id] = signature
+        for bucket, key in zip(self.buckets, self._keys(signature)):
+            bucket.setdefault(key, set()).add(id)
+
+    def remove(self, id):
+        signature = self.signatures.pop(id, None)
+        if signature is None:
+            return
+        for bucket, key in zip(self.buckets, self._keys(signature)):
+            members = bucket.get(key)
+            if members is not None:
+                members.discard(id)
+                if not members:
+                    del bucket[key]
+
+    # 返回与signature估计相似度不低于threshold的论文[(ID, 相似度), ...]，按相似度从高到低排列；exclude为要排除的ID（通常是论文自身）
+    def query(self, signature, threshold=threshold, exclude=None, limit=None):
+        if signature is None:
+            return []
+        candidates = set()
+        for bucket, key in zip(self.buckets, self._keys(signature)):
+            members = bucket.get(key)
+            if members:
+                candidates.update(members)
+        candidates.discard(exclude)
+
+        matches = []
+        for id in candidates:
+            similarity = estimate_similarity(signature, self.signatures[id])
+            if similarity >= threshold:
+                matches.append((id, similarity))
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches[:limit] if limit else matches
+
+    def _meta(self):
+        return {
+            'version': self.version, 'fingerprint': self.fingerprint, 'uid': self.uid,
+            'num_perm': self.num_perm, 'bands': self.bands, 'shingle_size': self.shingle_size, 'seed': self.seed,
+        }
+
+    # 保存为.npz（论文ID、签名矩阵和参数）；先写临时文件再替换，避免留下写了一半的索引
+    def save(self, path):
+        path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        ids = list(self.signatures)
+        signatures = np.array([self.signatures[id] for id in ids], dtype=np.uint32).reshape(-1, self.num_perm)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.savez(f, ids=np.array(ids, dtype=str), signatures=signatures, meta=np.array(json.dumps(self._meta())))
+        os.replace(temp_path, path)
+
+    # 读取保存的索引；文件不存在、无法读取或参数、fingerprint不一致时返回None
+    @classmethod
+    def load(cls, path, fingerprint='', num_perm=num_perm, bands=bands, shingle_size=shingle_size, seed=seed):
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                ids = data['ids'].tolist()
+                signatures = data['signatures']
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"相似度索引 '{path}' 无法读取，将重新建立: {e}")
+            return None
+
+        index = cls(fingerprint, num_perm, bands, shingle_size, seed)
+        expected = index._meta()
+        del expected['uid']
+        if {key: meta.get(key) for key in expected} != expected:
+            print("计算环境已改变，相似度索引作废，将重新建立。")
+            return None
+        index.uid = meta['uid']
+        for id, signature in zip(ids, signatures):
+            index.add(id, signature)
+        return index
+
+# 把查询结果格式化为“ID:相似度”，多篇之间用分号分隔
+def format_matches(matches):
+    return ';'.join(f"{id}:{similarity:.2f}" for id, similarity in matches)
@@ -0,0 +1,72 @@
+import os
+import logging
+from itertools import islice
+import numpy as np
+from gensim.corpora import Dictionary
+from gensim.models import LdaMulticore
+
+# 语料级LDA主题模型
+# 整个语料只训练一个模型：先流式构建词典，再按小批次在线更新LdaMulticore，最后批量推断每篇论文的主题分布。
+# documents/corpus 可以是生成器工厂（每次调用返回一个新的迭代器），这样语料不必整体放在内存中。
+
+# 禁止gensim在终端打印训练日志
+logging.getLogger('gensim').setLevel(logging.WARNING)
+
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _iterate(documents):
+    return documents() if callable(documents) else iter(documents)
+
+# 构建词典；keep_n限制词典大小，no_below/no_above按文档频率过滤过于罕见或过于常见的词
+def build_dictionary(documents, no_below=1, no_above=1.0, keep_n=100000, chunksize=1000):
+    dictionary = Dictionary()
+    for chunk in _chunked(_iterate(documents), chunksize):
+        dictionary.add_documents(chunk)
+    dictionary.filter_extremes(no_below=no_below, no_above=no_above, keep_n=keep_n)
+    return dictionary
+
+# 在线训练：每读入chunksize篇论文（词袋表示）就更新一次模型，passes为遍历语料的次数
+def train_topic_model(corpus, dictionary, num_topics=5, workers=None, chunksize=2000, passes=1):
+    workers = workers or max((os.cpu_count() or 2) - 1, 1)
+    lda_model = LdaMulticore(num_topics=num_topics, id2word=dictionary, workers=workers, chunksize=chunksize, random_state=42)
+    for _ in range(passes):
+        for chunk in _chunked(_iterate(corpus), chunksize * workers):
+            lda_model.update(chunk)
+    return lda_model
+
+# 批量推断每篇论文的主题分布，返回形状为(论文数, 主题数)的数组
+def infer_topics(lda_model, corpus, chunksize=2000):
+    distributions = []
+    for chunk in _chunked(_iterate(corpus), chunksize):
+        gamma = lda_model.inference(chunk)[0]
+        distributions.append(gamma / gamma.sum(axis=1, keepdims=True))
+    if not distributions:
+        return np.empty((0, lda_model.num_topics))
+    return np.vstack(distributions)
+
+# 每个主题的关键词描述
+def topic_keywords(lda_model, num_words=10):
+    return [f"Topic {idx}: {topic}" for idx, topic in lda_model.print_topics(-1, num_words)]
+
+# 生成pyLDAvis可视化页面；只有在需要时才调用（也只有此时才导入pyLDAvis）
+def save_visualization(lda_model, dictionary, corpus, save_path):
+    import pyLDAvis
+    import pyLDAvis.gensim_models
+
+    vis = pyLDAvis.gensim_models.prepare(lda_model, list(_iterate(corpus)), dictionary)
+    pyLDAvis.save_html(vis, save_path)
+
+# 完整的主题分析流程：构建词典、训练模型、推断每篇论文的主题分布
+# 返回(模型, 词典, 词袋语料工厂, 主题分布)
+def analyze_topics(documents, num_topics=5, workers=None, chunksize=2000, passes=1):
+    dictionary = build_dictionary(documents)
+    corpus = lambda: (dictionary.doc2bow(tokens) for tokens in _iterate(documents))
+    lda_model = train_topic_model(corpus, dictionary, num_topics, workers, chunksize, passes)
+    distributions = infer_topics(lda_model, corpus, chunksize)
+    return lda_model, dictionary, corpus, distributions
@@ -1,48 +1,172 @@
 import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+from functools import partial
 import joblib
 import numpy as np
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import train_test_split, GridSearchCV, cross_val_score
 from sklearn.ensemble import RandomForestRegressor
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import make_pipeline
 from sklearn.metrics import mean_squared_error, r2_score
+
+# 直接运行本文件时也能导入features和utils
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
 from features.vocabulary import calculate_vocabulary_richness
 from features.syntax import analyze_syntax_complexity
 from features.coherence import evaluate_coherence
-from features.theme_relevance import evaluate_theme_relevance  # 假设您要添加一个新的特征模块
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-
-def prepare_features_and_labels(preprocessed_data):
-    features = []
-    labels = []
-
-    for data in preprocessed_data.values():
-        # 提取现有特征
-        vocab_richness = calculate_vocabulary_richness(data['tokens'])  # 词汇丰富度
-        syntax_complexity = analyze_syntax_complexity(data['sentences'])[0]  # 句法复杂性
-        coherence_score = evaluate_coherence(data['tokens'], data['coherence_words'])  # 连贯性
-
-        # 新增特征：主题相关性，需要用到的参数有标题、摘要、关键词和正文
-        theme_relevance = ......
-
-        # 合并所有特征
-        feature_vector = [vocab_richness, syntax_complexity, coherence_score, theme_relevance]
-
-        # 假设您有固定的评分或标签
-        label = data['score']  # 从数据集中提取的目标值
-
-        features.append(feature_vector)
-        labels.append(label)
-
-    return np.array(features), np.array(labels)
-
-def train_model(features, labels):
+from features.theme_relevance import score_theme_relevance
+from utils.parallel import parallel_map
+from utils.preprocessing import iter_papers, list_data_files, init_worker, preprocess_batch_worker, preprocess_chunksize, preload_segmenter, open_corpus_store, cache_fingerprint
+from utils import corpus_store
+
+# 训练用的特征及其顺序；特征的定义或顺序改变时需要把feature_set_version加一，使缓存的特征矩阵失效
+feature_names = ['vocab_richness', 'syntax_complexity', 'coherence_score', 'theme_relevance']
+feature_set_version = 1
+
+# 计算单篇论文的特征向量；STTR无法计算（不足一段）时记为NaN，训练时再填补
+# model为预处理使用的分词模型，标题和关键词用同一模型切分
+def essay_features(data, model='jieba'):
+    sentences = data.sentences
+
+    vocab_richness = calculate_vocabulary_richness(data.token_ids)[3]  # 词汇丰富度（STTR）
+    syntax_complexity = analyze_syntax_complexity(sentences)[0]  # 句法复杂性（平均句长）
+    coherence_score = evaluate_coherence(data.token_ids, data.coherence_words)  # 连贯性
+
+    # 主题相关性：与main.py中的T-Re相同，由标题和关键词与正文的相似度组成
+    title_similarity, abstract_similarity, keyword_similarity = score_theme_relevance(data.title, data.abstract, data.keywords, sentences, data.sentence_tokens, model)
+    theme_relevance = (title_similarity + 10 * keyword_similarity) / 2
+
+    vocab_richness = np.nan if vocab_richness == "null" else vocab_richness
+    return [vocab_richness, syntax_complexity, coherence_score, theme_relevance]
+
+# 已经有main.extract_features的结果行时（例如打分服务），直接由结果行得到特征向量，不再重复计算主题相关性等特征
+def features_from_row(row, data):
+    vocab_richness = np.nan if row['vocab_richness'] == "null" else row['vocab_richness']
+    return [vocab_richness, row['syntax_complexity'], evaluate_coherence(data.token_ids, data.coherence_words), row['relevance_score']]
+
+def _essay_features_with_label(data, model='jieba'):
+    return data.id, essay_features(data, model), data.score
+
+# 在子进程中完成一批论文的预处理和特征计算（parallel_map的batched模式）
+def feature_worker(items, model='jieba'):
+    return [_essay_features_with_label(data, model) for id, data in preprocess_batch_worker(items)]
+
+# 从列式语料存储中按下标读取论文并计算特征
+def stored_feature_worker(index, model='jieba'):
+    return _essay_features_with_label(corpus_store.worker_essay(index), model)
+
+# 把(ID, 特征, 标签)序列整理成矩阵；没有评分的论文不能用于训练，直接跳过
+# 同一ID出现多次时与load_data相同：保留第一次出现的位置、最后一次出现的结果
+def _stack(results):
+    rows = {}
+    for id, feature_vector, label in results:
+        rows[id] = (feature_vector, label)
+    rows = {id: row for id, row in rows.items() if row[1] is not None}
+    ids = list(rows)
+    features = [feature_vector for feature_vector, label in rows.values()]
+    labels = [label for feature_vector, label in rows.values()]
+    return ids, np.array(features, dtype=np.float64).reshape(-1, len(feature_names)), np.array(labels, dtype=np.float64)
+
+# 由已经预处理好的数据计算特征和标签；workers大于1时多进程计算
+def prepare_features_and_labels(preprocessed_data, workers=1, model='jieba'):
+    ids, features, labels = _stack(parallel_map(partial(_essay_features_with_label, model=model), preprocessed_data.values(), workers, chunksize=8))
+    return features, labels
+
+##### 特征矩阵缓存 #####
+# 特征矩阵以.npy文件保存在以缓存键命名的目录中，读取时使用内存映射，重复训练、交叉验证时不必再算一遍特征
+# 缓存键由特征集版本、预处理环境、数据目录以及其中每个XML文件的大小和修改时间组成（与增量清单判断文件是否改变的方法相同），
+# 计算缓存键时不必读取语料
+
+def feature_cache_key(data_dir, stop_words_file, model):
+    digest = hashlib.blake2b(f"f{feature_set_version}|{cache_fingerprint(stop_words_file, model)}".encode('utf-8'), digest_size=16)
+    data_dir = os.path.abspath(data_dir)
+    digest.update(f"\0{data_dir}".encode('utf-8'))
+    for filename in sorted(list_data_files(data_dir)):
+        stat = os.stat(os.path.join(data_dir, filename))
+        digest.update(f"\0{filename}\0{stat.st_size}\0{stat.st_mtime_ns}".encode('utf-8'))
+    return digest.hexdigest()
+
+def load_feature_matrix(matrix_dir):
+    try:
+        features = np.load(os.path.join(matrix_dir, 'features.npy'), mmap_mode='r')
+        labels = np.load(os.path.join(matrix_dir, 'labels.npy'), mmap_mode='r')
+        with open(os.path.join(matrix_dir, 'ids.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if meta['feature_names'] != feature_names:
+        return None
+    return meta['ids'], features, labels
+
+# 先写到临时目录再整体改名，避免其他进程读到写了一半的缓存
+def save_feature_matrix(matrix_dir, ids, features, labels):
+    temp_dir = f"{matrix_dir}.{os.getpid()}.tmp"
+    os.makedirs(temp_dir, exist_ok=True)
+    np.save(os.path.join(temp_dir, 'features.npy'), features)
+    np.save(os.path.join(temp_dir, 'labels.npy'), labels)
+    with open(os.path.join(temp_dir, 'ids.json'), 'w', encoding='utf-8') as f:
+        json.dump({'feature_names': feature_names, 'ids': ids}, f, ensure_ascii=False)
+    try:
+        os.rename(temp_dir, matrix_dir)
+    except OSError:
+        # 其他进程已经写好了同一份缓存
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+# 构建（或从缓存读取）整个语料的特征矩阵和标签，返回(论文ID列表, 特征矩阵, 标签)
+# feature_dir为None时不使用缓存；rebuild为True时忽略已有缓存重新计算
+# 传入store_dir时从列式语料存储（utils.corpus_store）读取预处理结果，不再解析XML和分词
+def build_feature_matrix(data_dir, stop_words_file, model, workers=1, cache_dir=None, feature_dir=None, rebuild=False, store_dir=None):
+    matrix_dir = None
+    if feature_dir is not None:
+        matrix_dir = os.path.join(os.path.abspath(feature_dir), feature_cache_key(data_dir, stop_words_file, model))
+        cached = None if rebuild else load_feature_matrix(matrix_dir)
+        if cached is not None:
+            ids, features, labels = cached
+            print(f"已从缓存读取特征矩阵：{features.shape[0]} 篇论文，{features.shape[1]} 个特征")
+            return ids, features, labels
+
+    if store_dir is not None:
+        store = open_corpus_store(data_dir, stop_words_file, model, store_dir, workers, cache_dir)
+        results = parallel_map(partial(stored_feature_worker, model=model), range(len(store)), workers, initializer=corpus_store.init_worker, initargs=(store.path,), chunksize=8)
+    else:
+        preload_segmenter(model, workers)
+        results = parallel_map(partial(feature_worker, model=model), iter_papers(data_dir), workers, initializer=init_worker, initargs=(stop_words_file, model, cache_dir), chunksize=preprocess_chunksize(model, 8), batched=True)
+    ids, features, labels = _stack(results)
+
+    if matrix_dir is not None:
+        if rebuild and os.path.isdir(matrix_dir):
+            shutil.rmtree(matrix_dir, ignore_errors=True)
+        save_feature_matrix(matrix_dir, ids, features, labels)
+    return ids, features, labels
+
+##### 训练 #####
+# n_jobs为随机森林和交叉验证使用的进程数（-1表示全部CPU核心）
+# search为True时用网格搜索选择超参数；cv大于1时另外报告交叉验证的R²
+def train_model(features, labels, n_jobs=-1, search=False, cv=5, model_path='writing_assessment_model.pkl'):
     # 划分数据集
     X_train, X_test, y_train, y_test = train_test_split(features, labels, test_size=0.2, random_state=42)
 
-    # 创建和训练模型
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
+    # 创建和训练模型；缺失的特征（如无法计算的STTR）用中位数填补
+    model = make_pipeline(SimpleImputer(strategy='median'), RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=n_jobs))
+    if search:
+        param_grid = {
+            'randomforestregressor__n_estimators': [100, 300],
+            'randomforestregressor__max_depth': [None, 10, 20],
+            'randomforestregressor__min_samples_leaf': [1, 3],
+        }
+        model = GridSearchCV(model, param_grid, cv=cv, scoring='r2', n_jobs=n_jobs)
+        model.fit(X_train, y_train)
+        print(f"最优超参数: {model.best_params_}，交叉验证R²: {model.best_score_:.4f}")
+        model = model.best_estimator_
+    else:
+        if cv > 1:
+            scores = cross_val_score(model, X_train, y_train, cv=cv, scoring='r2', n_jobs=n_jobs)
+            print(f"{cv}折交叉验证R²: {scores.mean():.4f} ± {scores.std():.4f}")
+        model.fit(X_train, y_train)
 
     # 在测试集上评估模型
     predictions = model.predict(X_test)
@@ -53,21 +177,32 @@ def train_model(features, labels):
     print(f"R²得分: {r2}")
 
     # 保存模型
-    joblib.dump(model, 'writing_assessment_model.pkl')
-    print("模型已保存为 'writing_assessment_model.pkl'")
+    joblib.dump(model, model_path)
+    print(f"模型已保存为 '{model_path}'")
+    return model
 
 if __name__ == "__main__":
-    # 调用数据预处理函数，得到处理后的数据
-    from utils.preprocessing import preprocess_data
-    base_directory = os.path.dirname(os.path.abspath(__file__))
-    data_directory = os.path.join(base_directory, '../data/raw/')  # 更新为原始数据目录
-    stop_words_path = os.path.join(base_directory, '../stopwords.txt')
+    # 与main.py相同，路径相对于仓库根目录
+    data_directory = './data/raw/'  # 原始数据目录
+    stop_words_path = './dict/stopwords.txt'
+    cache_directory = './data/cache/'  # 预处理结果缓存目录
+    feature_directory = './data/features/'  # 特征矩阵缓存目录
+    corpus_store_directory = './data/corpus/'  # 列式语料存储目录
     model_choice = 'jieba'  # 选择的分词模型
 
-    preprocessed_essays = preprocess_data(data_directory, stop_words_path, model_choice)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=1, help="计算特征的进程数，0表示使用全部CPU核心")
+    parser.add_argument('--n-jobs', type=int, default=-1, help="随机森林和交叉验证使用的进程数，-1表示使用全部CPU核心")
+    parser.add_argument('--search', action='store_true', help="用网格搜索选择超参数")
+    parser.add_argument('--cv', type=int, default=5, help="交叉验证的折数")
+    parser.add_argument('--rebuild-features', action='store_true', help="忽略已缓存的特征矩阵，重新计算")
+    parser.add_argument('--corpus-store', action='store_true', help="从列式语料存储读取预处理结果（不存在或数据已改变时先生成）")
+    args = parser.parse_args()
 
     # 准备特征和标签
-    features, labels = prepare_features_and_labels(preprocessed_essays)
+    ids, features, labels = build_feature_matrix(data_directory, stop_words_path, model_choice, args.workers, cache_directory, feature_directory, args.rebuild_features, corpus_store_directory if args.corpus_store else None)
+    if len(labels) < 2:
+        sys.exit("有评分（<Score>）的论文不足，无法训练模型。")
 
     # 训练模型
-    train_model(features, labels)
+    train_model(features, labels, args.n_jobs, args.search, args.cv)
@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import argparse
+import threading
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.preprocessing import init_worker, preprocess_worker, preprocess_batch_worker
+from utils.essay import Essay
+from utils.batching import MicroBatcher
+from utils.sinks import plain_value
+from main import extract_features, stop_words_path, model_choice
+from models.train import features_from_row, feature_names
+
+# 常驻的打分服务
+# 启动时只加载一次停用词、jieba词典、词表和train_model保存的模型，之后每个请求只需分词和计算特征
+# 并发到达的请求由MicroBatcher攒成小批次：整批论文一起预处理（使用HanLP时整批只发送一次分词请求），
+# 模型对整批论文只调用一次predict；特征函数都以单篇论文为单位，仍然逐篇计算
+#
+# POST /score  请求体为一篇论文 {"title", "abstract", "keywords", "body", "date", "curriculum", "id"}（body必填），
+#              或者 {"essays": [论文, ...]}；返回每篇论文的全部特征和预测分数（没有模型时为null），
+#              无法计算的特征（例如不足一段的STTR）为null
+# GET /health  服务状态
+
+host = '127.0.0.1'
+port = 8765
+model_path = 'writing_assessment_model.pkl'  # train_model保存的模型
+max_batch_size = 16  # 每批最多处理的论文数
+max_wait_ms = 5  # 第一篇论文到达后最多等待多少毫秒再开始处理
+
+class ScoringService:
+    def __init__(self, model_path=None, max_batch_size=16, max_wait=0.005):
+        # 停用词、jieba词典和预处理所需的状态在这里加载一次；打分服务处理的都是新论文，不使用预处理缓存
+        init_worker(stop_words_path, model_choice)
+        self.model = None
+        if model_path and os.path.exists(model_path):
+            import joblib
+            self.model = joblib.load(model_path)
+        self.batcher = MicroBatcher(self.score_batch, max_batch_size, max_wait)
+        self.lock = threading.Lock()
+        self.served = 0
+
+        # 先完整打分一篇论文，让TF-IDF、词表和模型的首次调用开销发生在启动阶段
+        self.score_batch([{'title': '预热', 'abstract': '预热。', 'keywords': '预热', 'body': '这是一篇用于预热的论文。因此，我们认为预热是必要的。'}])
+
+    @staticmethod
+    def to_essay(request, index):
+        body = request.get('body') or request.get('content')
+        if not body:
+            raise ValueError("缺少论文正文（body）")
+        return Essay(
+            id=str(request.get('id', index)),
+            title=request.get('title') or '',
+            author=request.get('author') or '',
+            curriculum=request.get('curriculum') or '',
+            date=request.get('date') or '',
+            keywords=request.get('keywords') or '',
+            abstract=request.get('abstract') or '',
+            body=body,
+            score=None
+        )
+
+    # 整批预处理；出错时逐篇重试，只让出错的论文返回错误
+    @staticmethod
+    def preprocess(items):
+        try:
+            return [data for id, data in preprocess_batch_worker(items)]
+        except Exception:
+            pass
+        prepared = []
+        for item in items:
+            try:
+                prepared.append(preprocess_worker(item)[1])
+            except Exception as e:
+                prepared.append(e)
+        return prepared
+
+    # 处理一批论文：整批预处理，逐篇计算特征，再对整批论文调用一次模型
+    def score_batch(self, requests):
+        results = [None] * len(requests)
+        items = []
+        for index, request in enumerate(requests):
+            try:
+                essay = self.to_essay(request, index)
+            except Exception as e:
+                results[index] = e
+                continue
+            items.append((index, (essay.id, essay)))
+
+        vectors = []
+        for (index, item), data in zip(items, self.preprocess([item for index, item in items])):
+            try:
+                if isinstance(data, Exception):
+                    raise data
+                row = extract_features(data)
+                vector = features_from_row(row, data)
+            except Exception as e:
+                results[index] = e
+                continue
+            row.pop('author', None)
+            row = {name: plain_value(value) for name, value in row.items()}
+            results[index] = {'features': row, 'model_features': dict(zip(feature_names, map(plain_value, vector)))}
+            vectors.append((index, vector))
+
+        if vectors:
+            scores = [None] * len(vectors)
+            if self.model is not None:
+                scores = self.model.predict(np.array([vector for index, vector in vectors], dtype=np.float64)).tolist()
+            for (index, vector), score in zip(vectors, scores):
+                results[index]['score'] = score
+        return results
+
+    def score(self, request):
+        return self.batcher(request)
+
+    def close(self):
+        self.batcher.close()
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        # 允许本地的index.html直接调用
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path != '/health':
+            self.send_json(404, {'error': '未知的路径'})
+            return
+        self.send_json(200, {'status': 'ok', 'model': self.service.model is not None, 'served': self.service.served})
+
+    def do_POST(self):
+        if self.path != '/score':
+            self.send_json(404, {'error': '未知的路径'})
+            return
+        start = time.perf_counter()
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8'))
+        except (ValueError, UnicodeDecodeError) as e:
+            self.send_json(400, {'error': f"请求体不是有效的JSON: {e}"})
+            return
+
+        if not isinstance(request, dict):
+            self.send_json(400, {'error': "请求体应为一篇论文或 {\"essays\": [...]}"})
+            return
+
+        batch = 'essays' in request
+        essays = request['essays'] if batch else [request]
+        futures = [self.service.batcher.submit(essay) for essay in essays]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except ValueError as e:
+                results.append({'error': str(e)})
+            except Exception as e:
+                results.append({'error': f"打分时发生错误: {e}"})
+        with self.service.lock:
+            self.service.served += len(results)
+
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+        if batch:
+            self.send_json(200, {'results': results, 'elapsed_ms': elapsed_ms})
+        else:
+            status = 400 if 'error' in results[0] else 200
+            self.send_json(status, dict(results[0], elapsed_ms=elapsed_ms))
+
+    # 不在终端逐条打印访问日志
+    def log_message(self, format, *args):
+        pass
+
+# 同时到达的连接较多时，默认的监听队列（5）会导致连接被重置
+class ScoringServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+def serve(host=host, port=port, model_path=model_path, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms):
+    print("正在加载词典和模型...")
+    start = time.time()
+    service = ScoringService(model_path, max_batch_size, max_wait_ms / 1000)
+    print(f"加载完毕，用时 {time.time() - start:.2f} 秒；模型：{model_path if service.model is not None else '未找到，只返回特征'}")
+
+    handler = type('Handler', (ScoringHandler,), {'service': service})
+    server = ScoringServer((host, port), handler)
+    print(f"打分服务已启动：http://{host}:{port}/score")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="常驻的论文打分服务")
+    parser.add_argument('--host', default=host)
+    parser.add_argument('--port', type=int, default=port)
+    parser.add_argument('--model', default=model_path, help="train_model保存的模型文件")
+    parser.add_argument('--batch-size', type=int, default=max_batch_size, help="每批最多处理的论文数")
+    parser.add_argument('--max-wait', type=float, default=max_wait_ms, help="攒批的最长等待时间（毫秒）")
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.model, args.batch_size, args.max_wait)
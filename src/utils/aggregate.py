@@ -0,0 +1,203 @@
+import hashlib
+import numpy as np
+
+from utils.sinks import Sink
+
+# 按课程、年月和作者群组汇总特征
+# FeatureTable把逐篇产出的结果行收集成列（分组键和各项特征各一列），本身是一个Sink，可以和其他输出一起接在MultiSink上；
+# 字符串键（课程、群组）在收集时就编码成整数，aggregate对整张表做向量化的分组统计：组合键按混合进制合成一个整数后编码一次，
+# 篇数和均值用np.bincount一次算出，分位数把(组, 值)整体排序一次后按各组的起止位置直接取值，不对分组逐个循环。
+
+group_keys = ('curriculum', 'year', 'month', 'cohort')  # 可用的分组键
+string_keys = ('curriculum', 'cohort')
+default_metrics = ('vocab_richness', 'clause_density', 'coherence_score', 'relevance_score')
+default_quantiles = (0.25, 0.5, 0.75)
+default_num_cohorts = 8  # 作者群组数
+default_min_cohort_authors = 3  # 按群组汇总时，作者少于该人数的组不输出
+
+# 把 “年-月-日” 形式的日期拆成(年, 月)；无法解析时为(0, 0)
+def parse_date(date):
+    parts = (date or '').split('-')
+    try:
+        return int(parts[0]), int(parts[1])
+    except (ValueError, IndexError):
+        return 0, 0
+
+# 作者匿名化：作者名加盐后取哈希，再按群组数取模，同一作者总是落在同一个群组，一个群组中有多位作者
+# 盐必须保密，否则拿到作者名单的人可以逐个计算出每位作者所在的群组
+def cohort_label(author, salt, num_cohorts=default_num_cohorts):
+    if not author:
+        return ''
+    digest = hashlib.blake2b(f"{salt}\0{author}".encode('utf-8'), digest_size=8).digest()
+    return f"C{int.from_bytes(digest, 'big') % num_cohorts:0{len(str(num_cohorts - 1))}d}"
+
+def _metric_value(value):
+    if value is None or value == 'null':
+        return np.nan
+    return float(value)
+
+# 列式特征表
+# salt为空时不计算作者群组，也不能按群组汇总
+class FeatureTable(Sink):
+    def __init__(self, metrics=default_metrics, salt='', num_cohorts=default_num_cohorts, min_cohort_authors=default_min_cohort_authors):
+        self.metrics = tuple(metrics)
+        self.salt = salt
+        self.num_cohorts = num_cohorts
+        self.min_cohort_authors = min_cohort_authors
+        self.keys = {key: [] for key in group_keys}  # 字符串键保存的是编码
+        self.labels = {key: {} for key in string_keys}  # 字符串键：值 -> 编码
+        self.authors = {}  # 作者 -> 编码，只用于统计各组的作者人数，不输出
+        self.author_codes = []
+        self.values = {metric: [] for metric in self.metrics}
+
+    def __len__(self):
+        return len(self.keys['curriculum'])
+
+    def _code(self, key, value):
+        labels = self.labels[key]
+        return labels.setdefault(value, len(labels))
+
+    def write(self, row):
+        year, month = parse_date(row.get('date'))
+        self.keys['curriculum'].append(self._code('curriculum', row.get('curriculum') or ''))
+        self.keys['year'].append(year)
+        self.keys['month'].append(month)
+        self.keys['cohort'].append(self._code('cohort', cohort_label(row.get('author'), self.salt, self.num_cohorts) if self.salt else ''))
+        self.author_codes.append(self.authors.setdefault(row.get('author') or '', len(self.authors)))
+        for metric in self.metrics:
+            self.values[metric].append(_metric_value(row.get(metric)))
+
+    # 分组键的(按值排序的取值数组, 每行在其中的下标)
+    def key_codes(self, key):
+        if key not in string_keys:
+            return np.unique(np.array(self.keys[key], dtype=np.int32), return_inverse=True)
+        labels = np.array(list(self.labels[key]), dtype=str)
+        order = np.argsort(labels)
+        rank = np.empty(len(labels), dtype=np.int64)
+        rank[order] = np.arange(len(labels))
+        return labels[order], rank[np.array(self.keys[key], dtype=np.int64)]
+
+    # 各列的numpy数组：字符串键为unicode数组，年月为int32，特征为float64（无法计算的值为NaN）
+    def columns(self):
+        columns = {}
+        for key in group_keys:
+            values, codes = self.key_codes(key)
+            columns[key] = values[codes]
+        for metric in self.metrics:
+            columns[metric] = self.metric(metric)
+        return columns
+
+    def metric(self, metric):
+        return np.array(self.values[metric], dtype=np.float64)
+
+    # pandas是可选依赖，只在需要DataFrame时才导入
+    def to_pandas(self):
+        try:
+            import pandas as pd
+        except ImportError:
+            raise RuntimeError("转换为DataFrame需要安装pandas：pip install pandas")
+        return pd.DataFrame(self.columns())
+
+# 对若干键做组合编码，返回(每组的键值元组列表, 每行所属的组号, 组数)；组按键值排序
+# 各键的编码按混合进制合成一个整数，只需对这一列做一次np.unique
+def group_codes(table, keys):
+    uniques, codes = zip(*(table.key_codes(key) for key in keys))
+    combined = np.zeros(len(table), dtype=np.int64)
+    for unique, code in zip(uniques, codes):
+        combined = combined * len(unique) + code
+    groups, inverse = np.unique(combined, return_inverse=True)
+    num_groups = len(groups)
+
+    # 由合成的整数还原出各键的下标
+    labels = []
+    for unique in reversed(uniques):
+        labels.append(unique[groups % len(unique)].tolist())
+        groups = groups // len(unique)
+    return list(zip(*reversed(labels))), inverse.reshape(-1), num_groups
+
+# 每组的非NaN个数、均值和分位数（线性插值，与np.quantile的默认方法相同）
+def grouped_statistics(values, groups, num_groups, quantiles=default_quantiles):
+    valid = ~np.isnan(values)
+    values, groups = values[valid], groups[valid]
+    counts = np.bincount(groups, minlength=num_groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = np.bincount(groups, weights=values, minlength=num_groups) / counts
+
+    # 按(组, 值)排序后，每组的值连续且有序
+    ordered = values[np.lexsort((values, groups))]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    present = counts > 0
+    result = np.full((num_groups, len(quantiles)), np.nan)
+    for j, q in enumerate(quantiles):
+        position = starts[present] + q * (counts[present] - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        result[present, j] = ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+    return counts, means, result
+
+# 每组的作者人数：对(组, 作者)去重后按组计数
+def group_author_counts(table, groups, num_groups):
+    pairs = np.unique(groups.astype(np.int64) * len(table.authors) + np.array(table.author_codes, dtype=np.int64))
+    return np.bincount(pairs // len(table.authors), minlength=num_groups)
+
+# 各组是否输出：按作者群组分组时，作者少于table.min_cohort_authors人的组不输出
+def _shown_groups(table, keys, groups, num_groups):
+    if 'cohort' not in keys:
+        return np.ones(num_groups, dtype=bool)
+    return group_author_counts(table, groups, num_groups) >= table.min_cohort_authors
+
+# aggregate因作者人数不足而没有输出的(组数, 这些组中的作者人数)
+def suppressed_groups(table, keys):
+    if 'cohort' not in keys or len(table) == 0:
+        return 0, 0
+    labels, groups, num_groups = group_codes(table, keys)
+    hidden = ~_shown_groups(table, keys, groups, num_groups)
+    authors = np.unique(np.array(table.author_codes, dtype=np.int64)[hidden[groups]])
+    return int(hidden.sum()), len(authors)
+
+def quantile_name(q):
+    return f"p{round(q * 100):02d}"
+
+# 分组汇总结果的字段及类型，可直接传给utils.sinks.open_sink
+def aggregate_fields(keys, metrics=default_metrics, quantiles=default_quantiles):
+    fields = [('group_by', 'string')]
+    fields += [(key, 'int' if key in ('year', 'month') else 'string') for key in keys]
+    fields.append(('count', 'int'))
+    for metric in metrics:
+        fields += [(f"{metric}_count", 'int'), (f"{metric}_mean", 'float')]
+        fields += [(f"{metric}_{quantile_name(q)}", 'float') for q in quantiles]
+    return fields
+
+# 按keys分组汇总，返回结果行列表（每组一行，按键值排序）；NaN（组内没有可用的值）记为None
+# 按作者群组分组时，作者少于table.min_cohort_authors人的组不输出（一个组只有一两位作者时，统计量仍然是个人的）
+def aggregate(table, keys, metrics=None, quantiles=default_quantiles):
+    unknown = [key for key in keys if key not in group_keys]
+    if unknown:
+        raise ValueError(f"未知的分组键: {', '.join(unknown)}（可用：{', '.join(group_keys)}）")
+    if 'cohort' in keys and not table.salt:
+        raise ValueError("按作者群组汇总需要设置不公开的盐")
+    metrics = table.metrics if metrics is None else tuple(metrics)
+    if len(table) == 0:
+        return []
+
+    labels, groups, num_groups = group_codes(table, keys)
+    sizes = np.bincount(groups, minlength=num_groups)
+    statistics = {metric: grouped_statistics(table.metric(metric), groups, num_groups, quantiles) for metric in metrics}
+
+    as_value = lambda value: None if np.isnan(value) else float(value)
+    shown = _shown_groups(table, keys, groups, num_groups)
+
+    rows = []
+    for index, label in enumerate(labels):
+        if not shown[index]:
+            continue
+        row = {'group_by': ','.join(keys)}
+        row.update(zip(keys, label))
+        row['count'] = int(sizes[index])
+        for metric, (counts, means, values) in statistics.items():
+            row[f"{metric}_count"] = int(counts[index])
+            row[f"{metric}_mean"] = as_value(means[index])
+            for q, value in zip(quantiles, values[index]):
+                row[f"{metric}_{quantile_name(q)}"] = as_value(value)
+        rows.append(row)
+    return rows
@@ -0,0 +1,60 @@
+from collections import deque
+
+# Aho–Corasick 多模式匹配自动机
+# 针对一组关键词只构建一次，之后对文本做一次线性扫描即可找出所有关键词的出现位置
+class KeywordAutomaton:
+    def __init__(self, keywords):
+        self.goto = [{}]       # 每个状态的转移表：字符 -> 下一个状态
+        self.fail = [0]        # 失配指针
+        self.output = [False]  # 到达该状态时是否匹配到了某个关键词（包括经失配指针可达的关键词）
+
+        # 构建字典树
+        for keyword in keywords:
+            state = 0
+            for char in keyword:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(False)
+                state = next_state
+            self.output[state] = True
+
+        # 按广度优先顺序计算失配指针
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] = self.output[next_state] or self.output[self.fail[next_state]]
+
+    # 读入一个字符后的状态
+    def _step(self, state, char):
+        while state and char not in self.goto[state]:
+            state = self.fail[state]
+        return self.goto[state].get(char, 0)
+
+    # 返回每个句子是否包含至少一个关键词
+    # 依次扫描各句，句内一旦命中就跳到下一句，整体仍是对全文的一次线性扫描
+    def sentence_mask(self, sentences):
+        # 空字符串作为关键词时，任何句子都算命中（与 '' in sentence 的结果一致）
+        if self.output[0]:
+            return [True] * len(sentences)
+
+        mask = []
+        for sentence in sentences:
+            state = 0
+            hit = False
+            for char in sentence:
+                state = self._step(state, char)
+                if self.output[state]:
+                    hit = True
+                    break
+            mask.append(hit)
+        return mask
@@ -0,0 +1,65 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+# 微批处理：多个线程并发提交的请求在后台线程中攒成小批次一起处理
+# 第一个请求到达后最多再等待max_wait秒，或攒够max_batch_size个请求就开始处理
+# process_batch接收一个列表，返回等长的结果列表；某一项的结果是异常对象时，只有该请求收到这个异常
+# 只有一个后台线程调用process_batch，所以其中使用的分词器等不需要是线程安全的
+class MicroBatcher:
+    def __init__(self, process_batch, max_batch_size=16, max_wait=0.005):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self.thread.start()
+
+    def submit(self, item):
+        future = Future()
+        self.queue.put((item, future))
+        return future
+
+    # 提交并等待结果
+    def __call__(self, item, timeout=None):
+        return self.submit(item).result(timeout)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                # 收到结束标记：先处理完当前批次，再让_run退出
+                self.queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            entry = self.queue.get()
+            if entry is None:
+                return
+            batch = self._collect(entry)
+            items = [item for item, future in batch]
+            try:
+                results = self.process_batch(items)
+            except Exception as e:
+                results = [e] * len(batch)
+            for (item, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
@@ -0,0 +1,96 @@
+import os
+import pickle
+import zlib
+import hashlib
+
+# 预处理结果的磁盘缓存
+# 缓存键是论文内容与预处理环境（分词模型、停用词表、词典版本）的哈希，内容不变就直接复用
+# 每篇论文一个文件，内容为 zlib 压缩后的 pickle；按最近使用时间淘汰，总大小不超过 max_bytes
+# 每个进程写入的数据每累计到 max_bytes 的 1/evict_fraction 就淘汰一次，运行很久或中途退出时缓存也不会远超上限
+class PreprocessCache:
+    evict_fraction = 16
+
+    def __init__(self, cache_dir, fingerprint, max_bytes=512 * 1024 * 1024, rebuild=False):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.fingerprint = fingerprint
+        self.max_bytes = max_bytes
+        self.rebuild = rebuild  # 为True时忽略已有缓存，重新计算并覆盖
+        self._written = 0  # 上次淘汰之后本进程写入的字节数
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    # 根据论文的全部字段和预处理环境生成缓存键
+    def key(self, info):
+        return record_digest(info, self.fingerprint)
+
+    def _path(self, key):
+        # 用前两位分子目录，避免单个目录下文件过多
+        return os.path.join(self.cache_dir, key[:2], key[2:] + '.bin')
+
+    def get(self, key):
+        if self.rebuild:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.loads(zlib.decompress(f.read()))
+            os.utime(path)  # 更新访问时间，用于LRU淘汰
+            return value
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # 缓存文件损坏时当作未命中处理
+            return None
+
+    def put(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+        # 先写临时文件再替换，多进程同时写入同一键时也不会读到半个文件
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+        self._written += len(data)
+        if self._written >= self.max_bytes // self.evict_fraction:
+            self.evict()
+
+    # 删除最久未使用的缓存文件，直到总大小不超过上限
+    def evict(self):
+        self._written = 0
+        entries = []
+        total_size = 0
+        for root, dirs, files in os.walk(self.cache_dir):
+            for filename in files:
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_size += stat.st_size
+
+        entries.sort()
+        for mtime, size, path in entries:
+            if total_size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+# 论文全部字段（以及salt）的哈希，字段内容任一改变哈希就会改变
+def record_digest(info, salt=''):
+    digest = hashlib.blake2b(salt.encode('utf-8'), digest_size=20)
+    for field, value in sorted(info.items(), key=lambda item: item[0]):
+        digest.update(b'\0' + field.encode('utf-8') + b'\0')
+        digest.update(str(value).encode('utf-8'))
+    return digest.hexdigest()
+
+def file_digest(path):
+    if not os.path.exists(path):
+        return ''
+    with open(path, 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
@@ -0,0 +1,261 @@
+import os
+import json
+import shutil
+import numpy as np
+
+from utils.vocab import Vocabulary
+from utils.essay import PreprocessedEssay
+
+# 列式语料存储
+# 把整个语料的预处理结果写成一组扁平的二进制数组，之后用numpy.memmap打开，不必再解析XML和分词：
+#   tokens        去除停用词后的token，语料级词表ID（int32），token_offsets[i]:token_offsets[i+1]为第i篇论文
+#   flags         去除停用词前每个词的词性ID（uint8），word_spans为每个词在正文中的字符区间，按word_offsets划分
+#   sentence_spans、sentence_bounds  每个句子的字符区间和词下标区间，按sentence_offsets划分
+#   text          清洗后的正文（UTF-8），按text_offsets划分
+#   records       其余字段（标题、关键词、统计量等），每篇一个JSON对象，按record_offsets划分
+#   vocabulary、ids  词表和论文ID的字符串表（UTF-8拼接 + 偏移数组）
+#   rows          第i篇论文在以上各数组中的行号：同一ID写入多次时保留第一次的位置，指向最后一次写入的行（与dict相同）
+# 读取一篇论文时，token、词性和区间都是memmap上的切片（不复制），只有正文和JSON字段需要解码。
+# 多个进程打开同一个存储时共享操作系统的页缓存，几乎不占用各自的私有内存。
+
+store_version = 3
+
+# (文件名, dtype, 每行的列数)；列数为None的是一维数组
+_arrays = {
+    'tokens': (np.int32, None), 'token_offsets': (np.int64, None),
+    'flags': (np.uint8, None), 'word_spans': (np.int32, 2), 'word_offsets': (np.int64, None),
+    'sentence_spans': (np.int32, 2), 'sentence_bounds': (np.int32, 2), 'sentence_offsets': (np.int64, None),
+    'text': (np.uint8, None), 'text_offsets': (np.int64, None),
+    'records': (np.uint8, None), 'record_offsets': (np.int64, None),
+    'vocabulary': (np.uint8, None), 'vocabulary_offsets': (np.int64, None),
+    'ids': (np.uint8, None), 'id_offsets': (np.int64, None),
+    'rows': (np.int64, None),
+}
+
+# 记录中保存的标量字段
+_record_fields = ('id', 'title', 'author', 'curriculum', 'date', 'keywords', 'abstract', 'score',
+                  'coherence_words', 'coherence_parameters', 'word_count', 'frequencies_counts', 'realword_ratio')
+
+def _json_default(value):
+    if hasattr(value, 'item'):
+        return value.item()
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"无法序列化 {type(value).__name__}")
+
+# memmap上的字符串表：按下标解码
+# 解码结果只缓存最近用到的一部分（超过cache_size个时清空），各进程不会各自积累一份完整的词表
+class StringTable:
+    cache_size = 65536
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+        self._decoded = {}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        index = int(index)
+        value = self._decoded.get(index)
+        if value is None:
+            if not 0 <= index < len(self):
+                raise IndexError(index)
+            if len(self._decoded) >= self.cache_size:
+                self._decoded.clear()
+            value = self._decoded[index] = bytes(self.data[self.offsets[index]:self.offsets[index + 1]]).decode('utf-8')
+        return value
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+def _write_strings(directory, name, offsets_name, strings, shapes):
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    with open(os.path.join(directory, name + '.bin'), 'wb') as f:
+        f.write(b''.join(encoded))
+    offsets.tofile(os.path.join(directory, offsets_name + '.bin'))
+    shapes[name] = int(offsets[-1])
+    shapes[offsets_name] = len(offsets)
+
+# 逐篇写入；所有论文写完后调用close，写入词表、偏移数组和描述文件，再把临时目录整体改名为path
+class CorpusStoreWriter:
+    def __init__(self, path, fingerprint='', sources=None):
+        self.path = os.path.abspath(path)
+        self.fingerprint = fingerprint
+        self.sources = sources or {}
+        self.temp_path = f"{self.path}.{os.getpid()}.tmp"
+        os.makedirs(self.temp_path, exist_ok=True)
+        self.vocabulary = Vocabulary()
+        self.flag_types = Vocabulary()
+        self.ids = []        # 每一行的论文ID
+        self.rows = []       # 第i篇论文 -> 行号
+        self.positions = {}  # 论文ID -> 第几篇
+        self.files = {}
+        self.offsets = {}
+        for name in ('tokens', 'flags', 'word_spans', 'sentence_spans', 'sentence_bounds', 'text', 'records'):
+            self.files[name] = open(os.path.join(self.temp_path, name + '.bin'), 'wb')
+            self.offsets[name] = [0]
+
+    def _append(self, name, array):
+        array = np.ascontiguousarray(array, dtype=_arrays[name][0])
+        array.tofile(self.files[name])
+        self.offsets[name].append(self.offsets[name][-1] + len(array))
+
+    # 逐篇追加；ID已经写入过时，新的一行替换原来那篇的内容（原来的行留在文件中但不再被引用）
+    def add(self, essay):
+        id = str(essay.id)
+        position = self.positions.get(id)
+        if position is None:
+            self.positions[id] = len(self.rows)
+            self.rows.append(len(self.ids))
+        else:
+            self.rows[position] = len(self.ids)
+        self.ids.append(id)
+        self._append('tokens', self.vocabulary.remap(essay.token_types, essay.token_ids))
+        self._append('flags', self.flag_types.remap(essay.flag_types, essay.flag_ids))
+        self._append('word_spans', essay.word_spans)
+        self._append('sentence_spans', essay.sentence_spans)
+        self._append('sentence_bounds', essay.sentence_bounds)
+        self._append('text', np.frombuffer(essay.text.encode('utf-8'), dtype=np.uint8))
+        record = {name: getattr(essay, name) for name in _record_fields}
+        self._append('records', np.frombuffer(json.dumps(record, ensure_ascii=False, default=_json_default).encode('utf-8'), dtype=np.uint8))
+
+    def close(self):
+        for file in self.files.values():
+            file.close()
+        if len(self.flag_types) > 256:
+            raise ValueError("词性种类超过256种，无法用uint8保存")
+
+        shapes = {}
+        for name in self.files:
+            shapes[name] = self.offsets[name][-1]
+        for name, offsets_name in (('tokens', 'token_offsets'), ('flags', 'word_offsets'), ('sentence_spans', 'sentence_offsets'), ('text', 'text_offsets'), ('records', 'record_offsets')):
+            offsets = np.array(self.offsets[name], dtype=np.int64)
+            offsets.tofile(os.path.join(self.temp_path, offsets_name + '.bin'))
+            shapes[offsets_name] = len(offsets)
+        _write_strings(self.temp_path, 'vocabulary', 'vocabulary_offsets', self.vocabulary.words, shapes)
+        _write_strings(self.temp_path, 'ids', 'id_offsets', self.ids, shapes)
+        np.array(self.rows, dtype=np.int64).tofile(os.path.join(self.temp_path, 'rows.bin'))
+        shapes['rows'] = len(self.rows)
+
+        meta = {
+            'version': store_version, 'fingerprint': self.fingerprint, 'sources': self.sources,
+            'count': len(self.rows), 'flag_types': self.flag_types.words, 'shapes': shapes,
+        }
+        with open(os.path.join(self.temp_path, 'store.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        # 先把旧的存储移开再改名；已经打开旧存储的进程仍然可以继续读取
+        old_path = f"{self.path}.{os.getpid()}.old"
+        if os.path.exists(self.path):
+            os.rename(self.path, old_path)
+        os.rename(self.temp_path, self.path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            for file in self.files.values():
+                file.close()
+            shutil.rmtree(self.temp_path, ignore_errors=True)
+
+def write_corpus_store(path, essays, fingerprint='', sources=None):
+    with CorpusStoreWriter(path, fingerprint, sources) as writer:
+        for essay in essays:
+            writer.add(essay)
+    return CorpusStore(path)
+
+# 以只读的内存映射打开语料存储；按下标或论文ID读取PreprocessedEssay
+class CorpusStore:
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        with open(os.path.join(self.path, 'store.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != store_version:
+            raise ValueError(f"语料存储 '{self.path}' 的版本不受支持")
+
+        shapes = self.meta['shapes']
+        for name, (dtype, columns) in _arrays.items():
+            shape = (shapes[name],) if columns is None else (shapes[name], columns)
+            # 长度为0的文件不能映射
+            array = np.memmap(os.path.join(self.path, name + '.bin'), dtype=dtype, mode='r', shape=shape) if shapes[name] else np.zeros(shape, dtype=dtype)
+            setattr(self, name, array)
+        self.vocabulary = StringTable(self.vocabulary, self.vocabulary_offsets)
+        self.ids = StringTable(self.ids, self.id_offsets)
+        self.flag_types = self.meta['flag_types']
+        self._rows = None
+
+    @classmethod
+    def open(cls, path, fingerprint=None, sources=None):
+        try:
+            store = cls(path)
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+        if fingerprint is not None and store.meta['fingerprint'] != fingerprint:
+            return None
+        if sources is not None and store.meta['sources'] != sources:
+            return None
+        return store
+
+    @property
+    def fingerprint(self):
+        return self.meta['fingerprint']
+
+    def __len__(self):
+        return self.meta['count']
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        index = int(self.rows[index])
+        token_start, token_end = self.token_offsets[index:index + 2]
+        word_start, word_end = self.word_offsets[index:index + 2]
+        sentence_start, sentence_end = self.sentence_offsets[index:index + 2]
+        text_start, text_end = self.text_offsets[index:index + 2]
+        record_start, record_end = self.record_offsets[index:index + 2]
+
+        record = json.loads(bytes(self.records[record_start:record_end]).decode('utf-8'))
+        return PreprocessedEssay(
+            text=bytes(self.text[text_start:text_end]).decode('utf-8'),
+            sentence_spans=self.sentence_spans[sentence_start:sentence_end],
+            word_spans=self.word_spans[word_start:word_end],
+            flag_ids=self.flags[word_start:word_end],
+            flag_types=self.flag_types,
+            sentence_bounds=self.sentence_bounds[sentence_start:sentence_end],
+            token_ids=self.tokens[token_start:token_end],
+            token_types=self.vocabulary,
+            **record
+        )
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+    # 论文ID -> 下标；第一次调用时才建立
+    def index(self, id):
+        if self._rows is None:
+            self._rows = {self.ids[row]: index for index, row in enumerate(self.rows.tolist())}
+        return self._rows[str(id)]
+
+    def get(self, id):
+        return self[self.index(id)]
+
+    def items(self):
+        return ((self.ids[self.rows[index]], self[index]) for index in range(len(self)))
+
+##### 多进程支持 #####
+# 子进程各自打开一次存储（只是建立内存映射），之后按下标读取论文，不必通过进程间通信传递论文内容
+_worker_store = None
+
+def init_worker(path):
+    global _worker_store
+    _worker_store = CorpusStore(path)
+
+def worker_essay(index):
+    return _worker_store[index]
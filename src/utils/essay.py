@@ -0,0 +1,72 @@
+import numpy as np
+
+# 论文记录使用__slots__，不为每个对象创建__dict__；序列化时只保存字段值元组
+class _Record:
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    # 按(字段名, 值)遍历，用于计算缓存键等
+    def items(self):
+        return ((name, getattr(self, name)) for name in self.__slots__)
+
+    def __repr__(self):
+        return f"{type(self).__name__}(id={self.id!r}, title={self.title!r})"
+
+# 从XML中读取的原始论文
+class Essay(_Record):
+    __slots__ = ('id', 'title', 'author', 'curriculum', 'date', 'keywords', 'abstract', 'body', 'score')
+
+# 预处理后的论文
+# 正文只保存一份清洗后的字符串text，句子和分词结果都以该字符串中的位置区间表示，需要时再切片得到
+class PreprocessedEssay(_Record):
+    __slots__ = (
+        'id', 'title', 'author', 'curriculum', 'date', 'keywords', 'abstract', 'score',
+        'text',                   # 清洗后的正文
+        'sentence_spans',         # 每个句子在text中的字符区间，形状为(句子数, 2)
+        'word_spans',             # 去除停用词之前的每个词在text中的字符区间，形状为(词数, 2)
+        'flag_ids', 'flag_types',  # 每个词的词性：flag_types[flag_ids[i]]
+        'sentence_bounds',        # 每个句子包含的词的下标区间，形状为(句子数, 2)
+        'token_ids', 'token_types',  # 去除停用词后的token：token_types[token_ids[i]]
+        'coherence_words', 'coherence_parameters', 'word_count', 'frequencies_counts', 'realword_ratio',
+        'lda_topics'              # 语料级LDA模型推断的主题分布（开启LDA分析时才有）
+    )
+
+    @property
+    def sentences(self):
+        text = self.text
+        return [text[start:end] for start, end in self.sentence_spans.tolist()]
+
+    @property
+    def words(self):
+        text = self.text
+        return [text[start:end] for start, end in self.word_spans.tolist()]
+
+    @property
+    def flags(self):
+        flag_types = self.flag_types
+        return [flag_types[id] for id in self.flag_ids.tolist()]
+
+    @property
+    def tokens(self):
+        token_types = self.token_types
+        return [token_types[id] for id in self.token_ids.tolist()]
+
+    # 每个句子的分词结果（去除停用词之前）
+    @property
+    def sentence_tokens(self):
+        words = self.words
+        return [words[start:end] for start, end in self.sentence_bounds.tolist()]
+
+# 把区间列表转换成紧凑的(n, 2) int32数组
+def as_spans(spans):
+    return np.array(spans, dtype=np.int32).reshape(-1, 2)
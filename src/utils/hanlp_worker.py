@@ -0,0 +1,101 @@
+# HanLP 常驻分词进程
+# pyhanlp 需要单独的 Python 解释器（例如 Python 3.8），所以分词在子进程中完成。
+# 子进程启动时只加载一次模型，之后通过管道成批接收文本、返回分词结果。
+# 通信协议：每一帧是 4 字节大端长度 + UTF-8 编码的 JSON；
+# 请求为文本列表，响应为对应的 [[词, 词性], ...] 列表；长度为 0 的帧表示退出。
+# 本文件同时作为子进程的入口脚本运行，只能使用标准库，并需兼容 Python 3.8。
+import os
+import sys
+import json
+import atexit
+import struct
+import subprocess
+
+_header = struct.Struct('>I')
+
+def write_frame(stream, payload):
+    data = json.dumps(payload).encode('utf-8')
+    stream.write(_header.pack(len(data)))
+    stream.write(data)
+    stream.flush()
+
+def _read_exact(stream, size):
+    data = b''
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise EOFError("分词进程的管道已关闭")
+        data += chunk
+    return data
+
+# 读取一帧；收到长度为 0 的结束帧时返回 None
+def read_frame(stream):
+    size = _header.unpack(_read_exact(stream, _header.size))[0]
+    if size == 0:
+        return None
+    return json.loads(_read_exact(stream, size).decode('utf-8'))
+
+# 客户端：启动并持有一个常驻的 HanLP 分词进程
+class HanLPWorker:
+    def __init__(self, python_executable):
+        self.process = subprocess.Popen([python_executable, os.path.abspath(__file__)], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    # 成批分词，返回每段文本的 [(词, 词性), ...]
+    def segment(self, texts):
+        try:
+            write_frame(self.process.stdin, list(texts))
+            result = read_frame(self.process.stdout)
+        except (EOFError, BrokenPipeError, OSError) as e:
+            raise RuntimeError(f"HanLP分词进程异常退出（返回码 {self.process.poll()}）: {e}")
+        return [[tuple(pair) for pair in pairs] for pairs in result]
+
+    def close(self):
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.write(_header.pack(0))
+                self.process.stdin.close()
+                self.process.wait(timeout=10)
+            except Exception:
+                self.process.kill()
+
+# 每个进程（包括多进程模式下的每个子进程）只启动一个分词进程
+_workers = {}
+
+def get_worker(python_executable):
+    worker = _workers.get(python_executable)
+    if worker is None or worker.process.poll() is not None:
+        worker = HanLPWorker(python_executable)
+        _workers[python_executable] = worker
+    return worker
+
+@atexit.register
+def close_workers():
+    for worker in _workers.values():
+        worker.close()
+    _workers.clear()
+
+##### 子进程入口 #####
+def load_segmenter():
+    import pyhanlp
+    return lambda text: [(str(term.word), str(term.nature)) for term in pyhanlp.HanLP.segment(text)]
+
+def serve(loader):
+    # 协议只使用原始的标准输出；其余输出（包括JVM的日志）一律转到标准错误，避免破坏帧格式
+    output = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    input = sys.stdin.buffer
+
+    # 模型只在这里加载一次
+    segment = loader()
+
+    while True:
+        try:
+            texts = read_frame(input)
+        except EOFError:
+            break
+        if texts is None:
+            break
+        write_frame(output, [segment(text) for text in texts])
+
+if __name__ == '__main__':
+    serve(load_segmenter)
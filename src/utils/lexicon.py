@@ -0,0 +1,74 @@
+import xml.etree.ElementTree as ET
+from collections import Counter
+from functools import lru_cache
+
+# 关联词的类别名；转述性标记的类别名取自 reporting markers.xml 中的元素名
+coherence_category = 'coherence'
+marker_categories = ('researches', 'statements', 'cognition')  # 研究性、话语性、认知性标记
+
+# 词表索引：把关联词和各类转述性标记放进同一个哈希表（词 -> 类别）
+# 词表中的词可能被分词器切成多个token（例如“注意到”切成“注意”“到”），所以同时记录所有词的前缀，
+# 扫描时沿着token向后拼接，取最长的匹配
+class Lexicon:
+    def __init__(self, entries):
+        self.index = {}       # 词 -> 该词所属的类别元组
+        self.prefixes = set()  # 所有词的真前缀，用于判断是否需要继续向后拼接token
+        for word, category in entries:
+            if not word:
+                continue
+            categories = self.index.get(word, ())
+            if category not in categories:
+                self.index[word] = categories + (category,)
+            for end in range(1, len(word)):
+                self.prefixes.add(word[:end])
+
+    # 扫描一遍token序列，返回(各类别的出现次数, 匹配到的关联词列表)
+    def count(self, tokens):
+        counts = Counter()
+        coherence_words = []
+        index = self.index
+        prefixes = self.prefixes
+
+        i = 0
+        total = len(tokens)
+        while i < total:
+            text = tokens[i]
+            match, match_end = (text, i + 1) if text in index else (None, i + 1)
+
+            # 当前拼接结果是某个词的前缀时，继续向后拼接，寻找更长的匹配
+            j = i + 1
+            while text in prefixes and j < total:
+                text += tokens[j]
+                j += 1
+                if text in index:
+                    match, match_end = text, j
+
+            if match is not None:
+                for category in index[match]:
+                    counts[category] += 1
+                    if category == coherence_category:
+                        coherence_words.append(match)
+                i = match_end
+            else:
+                i += 1
+
+        return counts, coherence_words
+
+# 读取关联词表（每行一个词）和转述性标记表（每个类别一个元素，词之间用空白分隔）
+def read_entries(coherence_keywords_path, reporting_markers_path):
+    entries = []
+    with open(coherence_keywords_path, 'r', encoding='utf-8') as f:
+        entries.extend((word.strip(), coherence_category) for word in f.read().splitlines())
+
+    root = ET.parse(reporting_markers_path).getroot()
+    for element in root:
+        entries.extend((word, element.tag) for word in (element.text or '').split())
+    return entries
+
+# 每个进程只读取一次词表文件
+@lru_cache(maxsize=None)
+def load_lexicon(coherence_keywords_path, reporting_markers_path):
+    try:
+        return Lexicon(read_entries(coherence_keywords_path, reporting_markers_path))
+    except Exception as e:
+        raise RuntimeError(f"读取词表文件时发生错误: {e}")
@@ -0,0 +1,57 @@
+import os
+import json
+
+# 增量计算的清单
+# 记录上一次运行时数据目录中每个XML文件的大小、修改时间和其中每篇论文的(ID, 内容哈希)，以及每个论文ID所采用的论文的内容哈希和结果行。
+# 文件未变时不必重新解析；论文内容哈希未变时直接复用结果行，只有新增或修改的论文需要重新计算。
+# 内容哈希按文件记录，同一ID出现在多个文件中时，未变的文件也能判断结果行是否属于自己的那一篇。
+# fingerprint描述计算环境（预处理和特征的版本、分词模型、词表等），与清单中记录的不一致时整个清单作废。
+class ResultManifest:
+    version = 2
+
+    def __init__(self, path, fingerprint):
+        self.path = os.path.abspath(path)
+        self.fingerprint = fingerprint
+        self.files = {}   # 文件名 -> [大小, 修改时间(ns), [[论文ID, 内容哈希], ...]]
+        self.papers = {}  # 论文ID -> [内容哈希, 结果行]
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"增量清单 '{self.path}' 无法读取，将重新计算全部论文: {e}")
+            return
+        if state.get('version') != self.version or state.get('fingerprint') != self.fingerprint:
+            print("计算环境已改变，增量清单作废，将重新计算全部论文。")
+            return
+        self.files = state['files']
+        self.papers = state['papers']
+
+    # 文件的大小和修改时间都与清单一致时，认为文件未变，返回其中的[[论文ID, 内容哈希], ...]；否则返回None
+    def unchanged_file(self, filename, stat):
+        entry = self.files.get(filename)
+        if entry is None or entry[0] != stat.st_size or entry[1] != stat.st_mtime_ns:
+            return None
+        return entry[2]
+
+    # 内容哈希一致时返回之前的结果行，否则返回None
+    def lookup(self, id, digest):
+        entry = self.papers.get(id)
+        if entry is None or entry[0] != digest:
+            return None
+        return entry[1]
+
+    # 先写临时文件再替换，中途中断也不会留下损坏的清单
+    def save(self, files, papers):
+        self.files, self.papers = files, papers
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        state = {'version': self.version, 'fingerprint': self.fingerprint, 'files': files, 'papers': papers}
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            # 结果行中可能有numpy的数值类型
+            json.dump(state, f, ensure_ascii=False, default=lambda value: value.item())
+        os.replace(temp_path, self.path)
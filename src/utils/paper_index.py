@@ -0,0 +1,117 @@
+import os
+import re
+import json
+import mmap
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import unescape
+
+# 论文ID索引
+# 记录每篇<Paper>所在的XML文件及其字节区间，按ID读取少数几篇论文时只需定位、解析这几个片段，不必解析整个语料。
+# 建立索引时只做字节扫描（查找<Paper>和</Paper>标签及其中的<ID>），不构造XML树；
+# 文件的大小和修改时间都没变时沿用上次的扫描结果，只有新增或修改过的文件需要重新扫描。
+# 约定<Paper>标签不会出现在注释或CDATA中（正文中的“<”在XML里总是转义为&lt;）。
+
+_paper_start = re.compile(rb'<Paper[\s>]')
+_paper_end = b'</Paper>'
+_paper_id = re.compile(rb'<ID>(.*?)</ID>', re.S)
+_declared_encoding = re.compile(rb'<\?xml[^>]*encoding=["\']([A-Za-z0-9._-]+)["\']')
+
+# 扫描一个XML文件，返回(文件编码, [(论文ID, 起始字节, 长度), ...])，论文按文件中的顺序排列
+def scan_file(path):
+    entries = []
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return 'utf-8', entries
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            encoding = file_encoding(data[:200])
+            position = 0
+            while True:
+                match = _paper_start.search(data, position)
+                if match is None:
+                    break
+                start = match.start()
+                end = data.find(_paper_end, start)
+                if end < 0:
+                    break
+                end += len(_paper_end)
+                id_match = _paper_id.search(data, start, end)
+                if id_match is not None:
+                    entries.append((unescape(id_match.group(1).decode(encoding)), start, end - start))
+                position = end
+    return encoding, entries
+
+def file_encoding(head):
+    match = _declared_encoding.search(head)
+    return match.group(1).decode('ascii') if match else 'utf-8'
+
+class PaperIndex:
+    version = 1
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.files = {}      # 文件名 -> [大小, 修改时间(ns), 编码, [[论文ID, 起始字节, 长度], ...]]
+        self.positions = {}  # 论文ID -> (文件名, 起始字节, 长度)
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"论文ID索引 '{self.path}' 无法读取，将重新建立: {e}")
+            return
+        if state.get('version') == self.version:
+            self.files = state['files']
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.version, 'files': self.files}, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+    # 与数据目录同步：重新扫描新增或修改过的文件，移除已删除的文件；有变化时保存索引
+    # files为数据目录下的XML文件名，按读取顺序排列（同一ID出现多次时以最后一次为准，与load_data一致）
+    def refresh(self, data_dir, files):
+        changed = False
+        current = {}
+        for filename in files:
+            path = os.path.join(data_dir, filename)
+            stat = os.stat(path)
+            entry = self.files.get(filename)
+            if entry is None or entry[0] != stat.st_size or entry[1] != stat.st_mtime_ns:
+                encoding, papers = scan_file(path)
+                entry = [stat.st_size, stat.st_mtime_ns, encoding, [list(paper) for paper in papers]]
+                changed = True
+            current[filename] = entry
+        if changed or set(current) != set(self.files):
+            self.files = current
+            self.save()
+
+        self.positions = {}
+        for filename in files:
+            for id, offset, length in self.files[filename][3]:
+                self.positions[id] = (filename, offset, length)
+        return self
+
+    def __contains__(self, id):
+        return id in self.positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    # 读取一篇论文的<Paper>元素；索引中没有该ID时返回None
+    def read_element(self, data_dir, id):
+        position = self.positions.get(id)
+        if position is None:
+            return None
+        filename, offset, length = position
+        with open(os.path.join(data_dir, filename), 'rb') as f:
+            f.seek(offset)
+            fragment = f.read(length)
+        encoding = self.files[filename][2]
+        if encoding.lower().replace('-', '') != 'utf8':
+            fragment = fragment.decode(encoding)
+        return ET.fromstring(fragment)
@@ -0,0 +1,54 @@
+import os
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+
+# 将用户给定的进程数规范化：0或负数表示使用全部CPU核心
+def resolve_workers(workers):
+    if workers is None or workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+# 把输入切成固定大小的小批次，减少进程间通信的次数
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _apply_chunk(func, chunk):
+    return [func(item) for item in chunk]
+
+# 按输入顺序逐个产出 func(item) 的结果
+# workers 为1时直接在当前进程内执行；否则分发到进程池，initializer 在每个子进程中只执行一次
+# 同时在途的批次数量有上限（window），输入可以是生成器，结果按顺序边算边返回
+# batched 为True时 func 一次接收一个批次（最多chunksize个元素的列表），返回等长的结果列表；workers 为1时同样分批调用
+def parallel_map(func, iterable, workers=1, initializer=None, initargs=(), chunksize=1, window=None, batched=False):
+    workers = resolve_workers(workers)
+
+    if workers == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        if batched:
+            for chunk in _chunked(iterable, chunksize):
+                yield from func(chunk)
+            return
+        for item in iterable:
+            yield func(item)
+        return
+
+    max_pending = window or workers * 4
+    with Pool(workers, initializer, initargs) as pool:
+        pending = deque()
+        for chunk in _chunked(iterable, chunksize):
+            if batched:
+                pending.append(pool.apply_async(func, (chunk,)))
+            else:
+                pending.append(pool.apply_async(_apply_chunk, (func, chunk)))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().get()
+
+        while pending:
+            yield from pending.popleft().get()
@@ -3,19 +3,26 @@ import re
 import sys
 import io
 import warnings
-import subprocess
 import xml.etree.ElementTree as ET
-import logging
-from gensim import corpora
-from gensim.models import LdaModel
-import pyLDAvis.gensim_models
-import pyLDAvis
-import matplotlib.pyplot as plt
+import numpy as np
+from bisect import bisect_left
+from functools import lru_cache
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, '..'))
 sys.path.append(project_root)
 
+from utils.parallel import parallel_map, resolve_workers
+from utils.cache import PreprocessCache, file_digest
+from utils.lexicon import load_lexicon, marker_categories
+from utils.hanlp_worker import get_worker
+from utils.vocab import intern_tokens
+from utils.essay import Essay, PreprocessedEssay, as_spans
+from utils.segmenter import load_jieba, snapshot_version
+from utils.corpus_store import CorpusStore, write_corpus_store
+from utils.paper_index import PaperIndex
+from utils import profiling
+
 # from features.vocabulary import calculate_vocabulary_richness
 
 # 输入编码
@@ -26,82 +33,168 @@ base_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 data_directory = './data/raw'
 stop_words_path = './dict/stopwords.txt'
 coherence_keywords_path = './dict/coherence_keywords.txt'
+reporting_markers_path = './dict/reporting markers.xml'
+paper_index_path = './data/results/paper_index.json'  # 论文ID到所在文件和字节位置的索引
 
 # 分词模型
 model_choice = 'jieba'  # 用户可以指定分词模型，例如 'jieba'、'hanlp'、'snownlp'
 
+# 运行HanLP分词进程的Python解释器（需要安装pyhanlp），可通过环境变量HANLP_PYTHON指定
+hanlp_python_executable = os.environ.get('HANLP_PYTHON', sys.executable)
+# HanLP每次分词请求都要经过进程间通信，一次请求最多发送这么多篇论文的正文
+hanlp_batch_size = 16
+
 # 禁止jieba在终端打印building和loading信息
 warnings.filterwarnings('ignore', category=UserWarning, module='jieba')
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
+# 读取整个语料，返回{id: info}；同一ID出现多次时保留第一次出现的位置和最后一次出现的内容
 def load_data(data_dir):
-    essays = {}
-    data_dir = os.path.abspath(data_dir)
-    print("数据目录:", data_dir)
-    print("开始读取数据...")
-
+    return dict(iter_papers(data_dir))
+
+# 从一个<Paper>元素中取出论文的各个字段
+def parse_paper(paper):
+    id = paper.find('ID').text
+    title = paper.find('Metadata/Title').text
+    author = paper.find('Metadata/Author').text
+    curriculum = paper.find('Metadata/Curriculum').text
+    year = paper.find('Metadata/Year').text
+    month = paper.find('Metadata/Month').text
+    day = paper.find('Metadata/Day').text
+    keywords = paper.find('Keywords').text
+    abstract = paper.find('Abstract').text
+    body = paper.find('Body').text
+    # 评分（用于训练模型）是可选字段
+    score = paper.find('Metadata/Score')
+    if score is None:
+        score = paper.find('Score')
+    score = float(score.text) if score is not None and score.text else None
+    return id, Essay(
+        id=id,
+        title=title,
+        author=author,
+        curriculum=curriculum,
+        date=f"{year}-{month}-{day}",
+        keywords=keywords,
+        abstract=abstract,
+        body=body,
+        score=score
+    )
+
+# 数据目录下的全部XML文件名
+def list_data_files(data_dir):
     if not os.path.exists(data_dir):
         raise FileNotFoundError(f"数据目录 '{data_dir}' 不存在，请检查路径是否正确。")
 
     try:
-        for filename in os.listdir(data_dir):
-            if filename.endswith('.xml'):
-                try:
-                    tree = ET.parse(os.path.join(data_dir, filename))
-                    root = tree.getroot()
-                    for paper in root.findall('.//Paper'):
-                        id = paper.find('ID').text
-                        title = paper.find('Metadata/Title').text
-                        author = paper.find('Metadata/Author').text
-                        curriculum = paper.find('Metadata/Curriculum').text
-                        year = paper.find('Metadata/Year').text
-                        month = paper.find('Metadata/Month').text
-                        day = paper.find('Metadata/Day').text
-                        keywords = paper.find('Keywords').text
-                        abstract = paper.find('Abstract').text
-                        body = paper.find('Body').text
-                        essays[id] = {
-                            'title': title,
-                            'author': author,
-                            'curriculum': curriculum,
-                            'date': f"{year}-{month}-{day}",
-                            'keywords': keywords,
-                            'abstract': abstract,
-                            'body': body
-                        }
-                except ET.ParseError as e:
-                    print(f"解析 {filename} 时发生错误: {e}")
-                except Exception as e:
-                    print(f"处理文件 '{filename}' 时发生错误: {e}")
+        return [filename for filename in os.listdir(data_dir) if filename.endswith('.xml')]
     except Exception as e:
         raise RuntimeError(f"读取文件时发生错误: {e}")
 
-    return essays
+# 流式读取一个XML文件中的论文，逐篇产出(id, info)
+# 使用iterparse边解析边产出，每篇<Paper>用完后立即从树中移除，内存占用与语料大小无关
+def iter_file_papers(path):
+    filename = os.path.basename(path)
+    try:
+        parents = []  # 当前元素的祖先栈，用于把处理完的<Paper>从父元素中移除
+        for event, elem in ET.iterparse(path, events=('start', 'end')):
+            if event == 'start':
+                parents.append(elem)
+                continue
+
+            parents.pop()
+            if elem.tag == 'Paper':
+                yield parse_paper(elem)
+                elem.clear()
+                if parents:
+                    parents[-1].remove(elem)
+    except ET.ParseError as e:
+        print(f"解析 {filename} 时发生错误: {e}")
+    except Exception as e:
+        print(f"处理文件 '{filename}' 时发生错误: {e}")
+
+# 流式读取数据目录下的所有论文，逐篇产出(id, info)；每篇论文都会产出，包括重复ID的各次出现
+# 重复的ID由调用方按与dict相同的规则合并（保留第一次出现的位置、最后一次出现的内容），例如load_data、语料存储；
+# 流式输出（main.py --stream）无法收回已经输出的结果，重复ID的每次出现各输出一行
+# 读完后如果有重复的ID则打印警告；为此只在内存中保留论文ID
+def iter_papers(data_dir):
+    data_dir = os.path.abspath(data_dir)
+    print("数据目录:", data_dir)
+    print("开始读取数据...")
+
+    seen = set()
+    duplicates = []
+    for filename in list_data_files(data_dir):
+        for id, info in iter_file_papers(os.path.join(data_dir, filename)):
+            if id in seen:
+                duplicates.append(id)
+            seen.add(id)
+            yield id, info
+
+    warn_duplicate_ids(duplicates)
+
+def warn_duplicate_ids(duplicates):
+    if duplicates:
+        ids = sorted(set(duplicates))
+        shown = ', '.join(ids[:10]) + (' ...' if len(ids) > 10 else '')
+        print(f"警告：{len(ids)} 个论文ID在数据中出现了多次（{shown}），以最后一次出现的论文为准（流式输出中每次出现各占一行）。")
+
+# 按论文ID选择性读取：借助论文ID索引只解析指定的论文，返回{id: info}；数据目录中没有的ID不在结果中
+def load_papers(ids, data_dir=data_directory, index_path=paper_index_path):
+    data_dir = os.path.abspath(data_dir)
+    index = PaperIndex(index_path).refresh(data_dir, list_data_files(data_dir))
+    papers = {}
+    for id in ids:
+        element = index.read_element(data_dir, id)
+        if element is not None:
+            papers[id] = parse_paper(element)[1]
+    return papers
+
+# 只预处理指定ID的论文，返回{id: 预处理结果}
+def preprocess_papers(ids, data_dir=data_directory, stop_words_file=stop_words_path, model=model_choice, cache_dir=None, index_path=paper_index_path):
+    papers = load_papers(ids, data_dir, index_path)
+    return dict(parallel_map(preprocess_batch_worker, papers.items(), initializer=init_worker, initargs=(stop_words_file, model, cache_dir), chunksize=preprocess_chunksize(model), batched=True))
+
+# 分句规则：以句末标点或空白为界
+sentence_pattern = re.compile(r'[^。！？\s]+[。！？]?')
+
+# 实词的词性标记
+realword_flags = {'a', 'v', 'n', 't', 'nr', 'ns', 'nt', 'nz'}
 
 def split_sentences(text):
     text = re.sub(r'\s{2,}', ' ', text.replace('\n', ''))
-    sentences = re.findall(r'[^。！？\s]+[。！？]?', text)
+    sentences = sentence_pattern.findall(text)
     return sentences, text
 
-# 在分词之前，提前先处理一些数据
-def preprocess_in_advance(text, tokens, word_count):
+# 逐个定位词在原文中的起始位置（分词结果不一定与原文逐字对应，例如snownlp会丢弃空白）
+def locate_words(text, words):
+    starts = []
+    position = 0
+    for word in words:
+        found = text.find(word, position)
+        if found >= 0:
+            position = found
+        starts.append(position)
+        if found >= 0:
+            position += len(word)
+    return starts
+
+# 根据句子和词在原文中的位置，计算每个句子在词序列中的下标区间[start, end)
+def sentence_bounds(sentence_spans, word_starts):
+    return [(bisect_left(word_starts, start), bisect_left(word_starts, end)) for start, end in sentence_spans]
+
+# 在去除停用词之前，提前先处理一些数据；tokens和flags是同一次分词得到的词和词性
+def preprocess_in_advance(tokens, flags, word_count):
+    # 关联词和转述性标记共用一个词表索引，扫描一遍token序列即可得到所有类别的计数
+    lexicon = load_lexicon(coherence_keywords_path, reporting_markers_path)
+    category_counts, coherence_words = lexicon.count(tokens)
+
     ##### 功能一：统计关联词 #####
-    # 关联词
-    with open(coherence_keywords_path, 'r', encoding='utf-8') as f:
-        coherence_dict = set(f.read().splitlines())
-        coherence_words = [word for word in tokens if word in coherence_dict]
-        coherence_parameters = tuple([len(coherence_words), round(len(coherence_words) / word_count,4)])
+    coherence_parameters = tuple([len(coherence_words), round(len(coherence_words) / word_count,4)])
 
     ##### 功能二：转述性标记 #####
-    # 转述性标记
-    token_researches = ['研究', '分析', '采用', '定义', '出版', '提供', '界定', '阐述', '考察', '描述', '发现', '表明', '证明', '揭示', '证实', '得出', '显示', '发表', '推动', '开创'] # 研究性标记
-    token_statements = ['认为', '提出', '指出', '强调', '所说', '探讨', '论述', '介绍', '主张'] # 话语性标记
-    token_cognition = ['看来', '考虑', '承认', '接受', '当作', '相信', '关注', '注意到', '看作', '思考'] # 认知性标记
-
-    # 统计各标记的出现次数
-    token_researches_count = sum([1 for token in tokens if token in token_researches])
-    token_statements_count = sum([1 for token in tokens if token in token_statements])
-    token_cognition_count = sum([1 for token in tokens if token in token_cognition])
+    # 统计各标记（研究性、话语性、认知性）的出现次数
+    token_researches_count, token_statements_count, token_cognition_count = (category_counts[category] for category in marker_categories)
     token_total_count = token_statements_count + token_researches_count + token_cognition_count
     
     # 频率的计算，保留到小数点后四位
@@ -114,133 +207,285 @@ def preprocess_in_advance(text, tokens, word_count):
     frequencies_counts = tuple([token_researches_count, token_statements_count, token_cognition_count, token_total_count,token_researches_ratio, token_statements_ratio, token_cognition_ratio,token_total_ratio])
 
     ##### 功能三：统计词汇密度（也就是实词的比例） #####
-    # 使用jieba进行词性标注，统计实词的比例
-    from jieba import posseg
-    wordcutted = posseg.cut(text)
-    real_word_count = len([word.word for word in wordcutted if word.flag in ['a', 'v', 'n', 't', 'nr', 'ns', 'nt', 'nz']])
+    # 直接使用分词时得到的词性标注，统计实词的比例
+    real_word_count = sum(1 for flag in flags if flag in realword_flags)
     realword_ratio = round(real_word_count / len(tokens), 4)
 
     return coherence_words, coherence_parameters, frequencies_counts, realword_ratio
 
 def tokenize(text, model):
+    return [word for word, flag in tokenize_with_pos(text, model)]
+
+# 分词并同时进行词性标注，返回(词, 词性)列表；所有特征共用这一次分词的结果
+# jieba的词序列与jieba.cut完全相同（posseg.cut的切分略有不同，会改变STTR等基于词序列的特征），
+# 词性取自词典中的标注，只有词典中没有的词（HMM新词、英文、数字等）才交给posseg单独标注
+def tokenize_with_pos(text, model):
     if model == 'jieba':
-        import jieba
-        jieba.setLogLevel(logging.ERROR)
-        return list(jieba.cut(text))
+        posseg = load_segmenter(model)
+        tags = posseg.dt.word_tag_tab
+        return [(word, tags.get(word) or _unknown_word_flag(word)) for word in posseg.dt.tokenizer.cut(text)]
     
     elif model == 'hanlp':
-        python38_executable = r"C:\Python38\python.exe"
-        command = [
-            python38_executable,
-            '-c',
-            f"import pyhanlp; result = pyhanlp.HanLP.segment('{text}'); print(','.join([str(item.word) for item in result]))"
-        ]
-        try:
-            output = subprocess.check_output(command, encoding='utf-8')
-        except UnicodeDecodeError:
-            output = subprocess.check_output(command, encoding='gbk')
-        return [word.strip() for word in output.split(',')]
+        return get_worker(hanlp_python_executable).segment([text])[0]
     
     elif model == 'snownlp':
         from snownlp import SnowNLP
         s = SnowNLP(text)
-        return list(s.words)
+        return list(s.tags)
 
     raise ValueError("Unsupported model. Please choose 'jieba', 'hanlp', or 'snownlp'.")
 
-def preprocess_data(data_dir, stop_words_file, model, enable_lda_analysis):
-    essays = load_data(data_dir)
-    preprocessed_data = {}
-    
+# 词典中没有的词用posseg标注；posseg把它切成几段时取最后一段的词性（中文复合词的中心语通常在后）
+@lru_cache(maxsize=65536)
+def _unknown_word_flag(word):
+    pairs = list(load_segmenter('jieba').cut(word))
+    return pairs[-1].flag if pairs else 'x'
+
+def load_stop_words(stop_words_file):
     try:
         with open(stop_words_file, 'r', encoding='utf-8') as file:
-            stop_words = set(file.read().splitlines())
+            return set(file.read().splitlines())
     except Exception as e:
         raise RuntimeError(f"读取停用词文件时发生错误: {e}")
 
-    for id, info in essays.items():
-        sentences = split_sentences(info['body'])[0]
-        cleaned_text = split_sentences(info['body'])[1]
-        tokens = tokenize(cleaned_text, model)
-        word_count = len(cleaned_text.replace(' ', '').replace('\n', ''))
-
-        coherence_words, coherence_parameters, frequencies_counts, realword_ratio = preprocess_in_advance(info['body'], tokens, word_count)
-
-        # 另一种实现方法：使用jieba进行词性标注，找出里面词性为c的词就是conjunctions_words
-        # from jieba import posseg
-        # words = posseg.cut(info['body'])
-        # conjunctions_words = [word.word for word in words if word.flag == 'c']
-        # conjunctions_count = len(conjunctions_words)
-        # conjunctions_ratio = round(conjunctions_count / word_count, 4)
-
-        keywords = re.findall(r'\w+', info['keywords'])
-        abstract = re.sub(r'\s{2,}', ' ', info['abstract'].replace('\n', ''))
-
-        # 去除停用词和空格，得到清洗后的token序列
-        tokens = [token.strip() for token in tokens if token.strip() not in stop_words]
-
-        # 添加基本的预处理结果
-        preprocessed_data[id] = {
-            'title': info['title'],
-            'author': info['author'],
-            'curriculum': info['curriculum'],
-            'date': info['date'],
-            'keywords': keywords,
-            'abstract': abstract,
-            'tokens': tokens,
-            'sentences': sentences,
-            'coherence_words': coherence_words,
-            'coherence_parameters': coherence_parameters,
-            'word_count': word_count,
-            'frequencies_counts': frequencies_counts,
-            'realword_ratio': realword_ratio
-        }
-
-        # 如果开启LDA分析，则执行LDA主题分析
-        if enable_lda_analysis:
-            # 构建字典和语料库
-            dictionary = corpora.Dictionary([tokens])
-            corpus = [dictionary.doc2bow(tokens)]
-
-            # 训练LDA模型
-            num_topics = 5
-            lda_model = LdaModel(corpus, num_topics=num_topics, id2word=dictionary, passes=15)
-
-            # 输出主题
-            topic_keywords = []
-            for idx, topic in lda_model.print_topics(-1):
-                topic_keywords.append(f"Topic {idx}: {topic}")
-
-            # 保存LDA可视化结果
-            vis = pyLDAvis.gensim_models.prepare(lda_model, corpus, dictionary)
-            save_path = os.path.join(data_directory, f'lda_visualization_{id}.html')
-            pyLDAvis.save_html(vis, save_path)
-
-            # 将主题关键词结果添加到preprocessed_data中
-            preprocessed_data[id]['lda_topics'] = topic_keywords  # 添加LDA主题关键词字段
+# 预处理单篇论文，返回该论文的预处理结果
+# cleaned_text和tagged为已经清洗过的正文及其分词结果（见preprocess_essays），不传时在这里计算
+def preprocess_essay(info, stop_words, model, cleaned_text=None, tagged=None):
+    with profiling.stage('split_sentences', info.id):
+        if cleaned_text is None:
+            cleaned_text = split_sentences(info.body)[1]
+        spans = [match.span() for match in sentence_pattern.finditer(cleaned_text)]
+
+    # 每篇论文只分词一次：同时得到词、词性和句子边界，后续所有特征都使用这一份结果
+    if tagged is None:
+        with profiling.stage('tokenize', info.id):
+            tagged = tokenize_with_pos(cleaned_text, model)
+    words = [word for word, flag in tagged]
+    flags = [flag for word, flag in tagged]
+    starts = locate_words(cleaned_text, words)
+    bounds = sentence_bounds(spans, starts)
+    word_count = len(cleaned_text.replace(' ', '').replace('\n', ''))
+
+    with profiling.stage('preprocess_in_advance', info.id):
+        coherence_words, coherence_parameters, frequencies_counts, realword_ratio = preprocess_in_advance(words, flags, word_count)
+
+    # 另一种实现方法：使用jieba进行词性标注，找出里面词性为c的词就是conjunctions_words
+    # from jieba import posseg
+    # words = posseg.cut(info.body)
+    # conjunctions_words = [word.word for word in words if word.flag == 'c']
+    # conjunctions_count = len(conjunctions_words)
+    # conjunctions_ratio = round(conjunctions_count / word_count, 4)
+
+    keywords = re.findall(r'\w+', info.keywords)
+    abstract = re.sub(r'\s{2,}', ' ', info.abstract.replace('\n', ''))
+
+    # 去除停用词和空格，得到清洗后的token序列
+    tokens = [token.strip() for token in words if token.strip() not in stop_words]
+
+    # 把token序列转换成整数ID数组，同时保留本篇的词表：token_types[token_ids[i]]即第i个token
+    token_types, token_ids = intern_tokens(tokens)
+    flag_types, flag_ids = intern_tokens(flags)
+
+    # 添加基本的预处理结果；句子和词只记录在正文中的位置，不再另存字符串副本
+    return PreprocessedEssay(
+        id=info.id,
+        title=info.title,
+        author=info.author,
+        curriculum=info.curriculum,
+        date=info.date,
+        keywords=keywords,
+        abstract=abstract,
+        score=info.score,
+        text=cleaned_text,
+        sentence_spans=as_spans(spans),
+        word_spans=as_spans([(start, start + len(word)) for start, word in zip(starts, words)]),
+        flag_ids=flag_ids.astype(np.uint8),
+        flag_types=flag_types,
+        sentence_bounds=as_spans(bounds),
+        token_ids=token_ids,
+        token_types=token_types,
+        coherence_words=coherence_words,
+        coherence_parameters=coherence_parameters,
+        word_count=word_count,
+        frequencies_counts=frequencies_counts,
+        realword_ratio=realword_ratio
+    )
+
+# 预处理一批论文：HanLP把整批正文放在一次请求中分词，其他模型逐篇分词
+def preprocess_essays(infos, stop_words, model):
+    if model != 'hanlp' or len(infos) < 2:
+        return [preprocess_essay(info, stop_words, model) for info in infos]
+    texts = [split_sentences(info.body)[1] for info in infos]
+    with profiling.stage('tokenize'):
+        tagged = get_worker(hanlp_python_executable).segment(texts)
+    return [preprocess_essay(info, stop_words, model, text, pairs) for info, text, pairs in zip(infos, texts, tagged)]
+
+##### 预处理缓存 #####
+# 预处理结果的格式版本，preprocess_essay的输出结构改变时需要加一，使旧缓存失效
+preprocess_version = 7
+
+# 预处理环境的指纹：分词模型及其版本、停用词表、关联词和转述性标记词表，任一改变都会使缓存失效
+def cache_fingerprint(stop_words_file, model):
+    parts = [f"v{preprocess_version}", model, file_digest(stop_words_file), file_digest(coherence_keywords_path), file_digest(reporting_markers_path)]
+    if model == 'jieba':
+        import jieba
+        parts.append(f"{jieba.__version__}|s{snapshot_version}")
+    return '|'.join(parts)
+
+def open_cache(cache_dir, stop_words_file, model, rebuild=False, max_bytes=512 * 1024 * 1024):
+    if cache_dir is None:
+        return None
+    return PreprocessCache(cache_dir, cache_fingerprint(stop_words_file, model), max_bytes, rebuild)
+
+##### 分词词典 #####
+# jieba使用预先生成的词典快照（见utils.segmenter），其中包含关联词和转述性标记，这些词不会再被切开
+def load_segmenter(model, share=False):
+    if model == 'jieba':
+        return load_jieba(coherence_keywords_path, reporting_markers_path, share=share)
+
+# 多进程时在创建进程池之前调用：主进程先加载词典快照，fork出的子进程直接共享这些内存页，不必各自加载（spawn出的子进程仍各自加载）
+def preload_segmenter(model, workers):
+    if resolve_workers(workers) > 1:
+        load_segmenter(model, share=True)
+
+##### 多进程支持 #####
+# 每个子进程只初始化一次的状态：停用词表、分词模型和预处理缓存
+_worker_stop_words = None
+_worker_model = None
+_worker_cache = None
+
+def init_worker(stop_words_file, model, cache_dir=None, rebuild_cache=False, cache_max_bytes=512 * 1024 * 1024):
+    global _worker_stop_words, _worker_model, _worker_cache
+    _worker_stop_words = load_stop_words(stop_words_file)
+    _worker_model = model
+    _worker_cache = open_cache(cache_dir, stop_words_file, model, rebuild_cache, cache_max_bytes)
+
+    # jieba的词典在这里加载一次，而不是在每篇论文上加载；主进程已经预先加载时直接沿用
+    load_segmenter(model)
+
+def preprocess_worker(item):
+    id, info = item
+    with profiling.stage('preprocess', id):
+        if _worker_cache is None:
+            return id, preprocess_essay(info, _worker_stop_words, _worker_model)
+
+        # 命中缓存时跳过分词等全部预处理步骤
+        with profiling.stage('cache_get', id):
+            key = _worker_cache.key(info)
+            essay = _worker_cache.get(key)
+        if essay is None:
+            essay = preprocess_essay(info, _worker_stop_words, _worker_model)
+            with profiling.stage('cache_put', id):
+                _worker_cache.put(key, essay)
+        return id, essay
+
+# preprocess_worker的批量版本，用于parallel_map的batched模式：先逐篇查缓存，未命中的论文一起预处理
+# 只有HanLP能从整批分词中获益，其他模型逐篇调用preprocess_worker
+def preprocess_batch_worker(items):
+    if _worker_model != 'hanlp':
+        return [preprocess_worker(item) for item in items]
+
+    essays = [None] * len(items)
+    keys = [None] * len(items)
+    with profiling.stage('preprocess'):
+        if _worker_cache is not None:
+            for position, (id, info) in enumerate(items):
+                with profiling.stage('cache_get', id):
+                    keys[position] = _worker_cache.key(info)
+                    essays[position] = _worker_cache.get(keys[position])
+        missing = [position for position, essay in enumerate(essays) if essay is None]
+        computed = preprocess_essays([items[position][1] for position in missing], _worker_stop_words, _worker_model)
+        for position, essay in zip(missing, computed):
+            essays[position] = essay
+            if _worker_cache is not None:
+                with profiling.stage('cache_put', items[position][0]):
+                    _worker_cache.put(keys[position], essay)
+    return [(id, essay) for (id, info), essay in zip(items, essays)]
+
+# parallel_map每批的论文篇数：HanLP按批分词，其他模型逐篇处理，不必攒批
+def preprocess_chunksize(model, default=1):
+    return max(hanlp_batch_size, default) if model == 'hanlp' else default
+
+# cache_dir为None时不使用缓存；rebuild_cache为True时忽略已有缓存并全部重新计算
+# 流式预处理：逐篇读取、逐篇产出(id, 预处理结果)，不在内存中保留整个语料
+def iter_preprocessed(data_dir, stop_words_file, model, workers=1, cache_dir=None, rebuild_cache=False):
+    preload_segmenter(model, workers)
+    return parallel_map(preprocess_batch_worker, iter_papers(data_dir), workers, initializer=init_worker, initargs=(stop_words_file, model, cache_dir, rebuild_cache), chunksize=preprocess_chunksize(model), batched=True)
+
+# 列式语料存储（见utils.corpus_store）：数据目录中XML文件的大小、修改时间和预处理环境都没变时直接打开，
+# 否则重新预处理整个语料并写入；rebuild为True时总是重新写入
+def open_corpus_store(data_dir, stop_words_file, model, store_dir, workers=1, cache_dir=None, rebuild=False):
+    data_dir = os.path.abspath(data_dir)
+    sources = {}
+    for filename in sorted(list_data_files(data_dir)):
+        stat = os.stat(os.path.join(data_dir, filename))
+        sources[filename] = [stat.st_size, stat.st_mtime_ns]
+    fingerprint = cache_fingerprint(stop_words_file, model)
+
+    store = None if rebuild else CorpusStore.open(store_dir, fingerprint, sources)
+    if store is None:
+        print("正在预处理语料并写入语料存储...")
+        essays = (essay for id, essay in iter_preprocessed(data_dir, stop_words_file, model, workers, cache_dir))
+        store = write_corpus_store(store_dir, essays, fingerprint, sources)
+    return store
+
+# 传入vocabulary（utils.vocab.Vocabulary）时，所有论文的token ID统一转换为该语料级词表中的ID
+# enable_lda_analysis为True时，在整个语料上训练一个LDA模型，并把每篇论文的主题分布写入lda_topics；
+# 传入lda_visualization_path时另外生成pyLDAvis可视化页面
+def preprocess_data(data_dir, stop_words_file, model, enable_lda_analysis, workers=1, cache_dir=None, rebuild_cache=False, vocabulary=None, num_topics=5, lda_visualization_path=None):
+    preprocessed_data = {}
+
+    results = iter_preprocessed(data_dir, stop_words_file, model, workers, cache_dir, rebuild_cache)
+    for id, essay in results:
+        if vocabulary is not None:
+            vocabulary.add_essay(essay)
+        preprocessed_data[id] = essay
+
+    # 如果开启LDA分析，则执行语料级的LDA主题分析
+    if enable_lda_analysis:
+        from models.topics import analyze_topics, topic_keywords, save_visualization
+
+        # 每次遍历时才生成token列表，不额外保存整个语料的token副本
+        documents = lambda: (essay.tokens for essay in preprocessed_data.values())
+        lda_model, dictionary, corpus, distributions = analyze_topics(documents, num_topics, workers=workers)
+
+        # 将每篇论文的主题分布添加到preprocessed_data中
+        for essay, distribution in zip(preprocessed_data.values(), distributions):
+            essay.lda_topics = distribution
+
+        print("LDA主题：")
+        for topic in topic_keywords(lda_model):
+            print(topic)
+
+        # 保存LDA可视化结果
+        if lda_visualization_path is not None:
+            save_visualization(lda_model, dictionary, corpus, lda_visualization_path)
+
+    # 缓存超过大小上限时淘汰最久未使用的条目
+    cache = open_cache(cache_dir, stop_words_file, model)
+    if cache is not None:
+        cache.evict()
 
     return preprocessed_data
 
 # 要打印结果作为测试
 if __name__ == '__main__':
-    enable_lda_analysis = False
-    preprocessed_data = preprocess_data(data_directory, stop_words_path, model_choice, enable_lda_analysis)
-    # print(preprocessed_data)
-
     # 打印某篇特定文档的数据，具体打印token、句子、主题关键词、coherence_words、word_count
+    # 只读取和预处理这一篇文档，不必处理整个语料
     userinput = input("请输入要打印的文档ID：")
+    preprocessed_data = preprocess_papers([userinput])
     if userinput in preprocessed_data:
-        print(f"标题：{preprocessed_data[userinput]['title']}")
-        print(f"句子：{preprocessed_data[userinput]['sentences']}")
-        print(f"关联词：{preprocessed_data[userinput]['coherence_parameters']}")
-        print(f"实词比例：{preprocessed_data[userinput]['realword_ratio']}")
-        print(f"转述标记使用情况：{preprocessed_data[userinput]['frequencies_counts']}")
+        print(f"标题：{preprocessed_data[userinput].title}")
+        print(f"句子：{preprocessed_data[userinput].sentences}")
+        print(f"关联词：{preprocessed_data[userinput].coherence_parameters}")
+        print(f"实词比例：{preprocessed_data[userinput].realword_ratio}")
+        print(f"转述标记使用情况：{preprocessed_data[userinput].frequencies_counts}")
                 
-        tokens = preprocessed_data[userinput]['tokens']
+        tokens = preprocessed_data[userinput].token_ids
         # 计算这篇文档的STTR，按照1000词一段的方式遍历，舍去最后不足1000词的部分
         sttr = 0
         num_segments = 0    
-        if not tokens:
+        if len(tokens) == 0:
             print("文档为空，无法计算STTR。")
             
         for i in range(0, len(tokens) - len(tokens) % 1000, 1000):
@@ -0,0 +1,194 @@
+import os
+import sys
+import time
+import json
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from functools import partial
+
+# 分阶段计时与性能分析
+# 在代码中用 with stage('阶段名', 论文ID): 包住要统计的部分；没有开启分析时 stage() 返回一个空的上下文，几乎没有开销。
+# 每次阶段结束记录一条事件 (阶段路径, 论文ID, 墙钟时间, CPU时间, 净分配字节数)，阶段路径由嵌套的阶段名用“/”连接。
+# 多进程时子进程各自记录事件，随每篇论文的结果一起送回主进程汇总（见 wrap_worker / collect）。
+# 通过 add_hook 注册的回调会在主进程收到每条事件时被调用：hook(path, essay_id, wall, cpu, allocated)。
+
+_active = None
+_hooks = []
+_null_stage = nullcontext()
+
+class Profiler:
+    # track_memory为True时用tracemalloc统计每个阶段的净分配字节数（会明显拖慢运行速度）
+    # remote为True表示这是子进程中的分析器，事件需要通过drain送回主进程
+    def __init__(self, track_memory=False, remote=False):
+        self.track_memory = track_memory
+        self.remote = remote
+        self.events = []
+        self.stack = []
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name, essay_id=None):
+        self.stack.append(name)
+        path = '/'.join(self.stack)
+        allocated = tracemalloc.get_traced_memory()[0] if self.track_memory else 0
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            allocated = tracemalloc.get_traced_memory()[0] - allocated if self.track_memory else None
+            self.stack.pop()
+            self.record((path, essay_id, wall, cpu, allocated))
+
+    def record(self, event):
+        self.events.append(event)
+        if not self.remote:
+            for hook in _hooks:
+                hook(*event)
+
+    # 子进程取出尚未送回的事件；主进程中的事件已经记录在原处，返回空列表
+    def drain(self):
+        if not self.remote:
+            return []
+        events, self.events = self.events, []
+        return events
+
+    # 主进程合并子进程送回的事件
+    def merge(self, events):
+        for event in events:
+            self.record(tuple(event))
+
+    # 按阶段路径汇总：{路径: [调用次数, 墙钟时间, CPU时间, 净分配字节数, 单次最长墙钟时间]}
+    def summary(self):
+        stats = {}
+        for path, essay_id, wall, cpu, allocated in self.events:
+            entry = stats.get(path)
+            if entry is None:
+                entry = stats[path] = [0, 0.0, 0.0, None, 0.0]
+            entry[0] += 1
+            entry[1] += wall
+            entry[2] += cpu
+            if allocated is not None:
+                entry[3] = (entry[3] or 0) + allocated
+            entry[4] = max(entry[4], wall)
+        return stats
+
+    # 某个阶段（按阶段名或完整路径匹配）用时最长的n篇论文：[(论文ID, 墙钟时间), ...]
+    def outliers(self, name, n=20):
+        totals = {}
+        for path, essay_id, wall, cpu, allocated in self.events:
+            if essay_id is not None and (path == name or path.rsplit('/', 1)[-1] == name):
+                totals[essay_id] = totals.get(essay_id, 0.0) + wall
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:n]
+
+    def report(self, outlier_stages=(), top=20, file=sys.stderr):
+        stats = self.summary()
+        print("性能分析（多进程时墙钟时间为各进程之和）：", file=file)
+        print(f"{'阶段':<40}{'次数':>8}{'墙钟(s)':>12}{'CPU(s)':>12}{'平均(ms)':>12}{'最长(ms)':>12}{'净分配(MB)':>12}", file=file)
+        for path in sorted(stats):
+            calls, wall, cpu, allocated, longest = stats[path]
+            allocated = f"{allocated / 1024 / 1024:>12.2f}" if allocated is not None else f"{'-':>12}"
+            print(f"{path:<40}{calls:>8}{wall:>12.3f}{cpu:>12.3f}{wall / calls * 1000:>12.2f}{longest * 1000:>12.2f}{allocated}", file=file)
+
+        for name in outlier_stages:
+            slowest = self.outliers(name, top)
+            if not slowest:
+                continue
+            print(f"{name} 用时最长的 {len(slowest)} 篇论文：", file=file)
+            for essay_id, wall in slowest:
+                print(f"  {essay_id:>10}  {wall * 1000:10.2f} ms", file=file)
+
+    # 输出折叠栈格式（flamegraph.pl、speedscope等工具可直接读取），数值为各阶段自身（不含子阶段）的微秒数
+    def write_folded(self, path):
+        totals = {stage_path: entry[1] for stage_path, entry in self.summary().items()}
+        self_time = dict(totals)
+        for stage_path, wall in totals.items():
+            parent = stage_path.rpartition('/')[0]
+            if parent in self_time:
+                self_time[parent] -= wall
+        with open(path, 'w', encoding='utf-8') as f:
+            for stage_path, wall in sorted(self_time.items()):
+                f.write(f"{stage_path.replace('/', ';')} {max(int(wall * 1e6), 0)}\n")
+
+    # 把全部原始事件保存为JSON Lines，便于事后分析
+    def write_events(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stage_path, essay_id, wall, cpu, allocated in self.events:
+                f.write(json.dumps({'stage': stage_path, 'id': essay_id, 'wall': wall, 'cpu': cpu, 'allocated': allocated}, ensure_ascii=False) + '\n')
+
+##### 模块级接口 #####
+# 开启性能分析；已经开启时返回当前的分析器
+def enable(track_memory=False):
+    global _active
+    if _active is None:
+        _active = Profiler(track_memory)
+    return _active
+
+def disable():
+    global _active
+    profiler, _active = _active, None
+    if profiler is not None and profiler.track_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    return profiler
+
+def get_profiler():
+    return _active
+
+def stage(name, essay_id=None):
+    if _active is None:
+        return _null_stage
+    return _active.stage(name, essay_id)
+
+def add_hook(hook):
+    _hooks.append(hook)
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+
+# 逐个计时生成器产出每个元素所用的时间（例如XML的流式解析）
+def profile_iter(name, iterable):
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+##### 多进程支持 #####
+def _profiled_initializer(initializer, initargs, track_memory, parent_pid):
+    global _active
+    # fork出的子进程会继承主进程的分析器，这里换成子进程自己的
+    if os.getpid() != parent_pid:
+        _active = Profiler(track_memory, remote=True)
+    if initializer is not None:
+        initializer(*initargs)
+
+def _profiled_call(func, item):
+    result = func(item)
+    return result, _active.drain() if _active is not None else []
+
+# 批量调用时整批的事件附在第一个结果上
+def _profiled_batch_call(func, items):
+    results = func(items)
+    events = _active.drain() if _active is not None else []
+    return [(result, events if index == 0 else []) for index, result in enumerate(results)]
+
+# 包装 parallel_map 的参数：子进程开启自己的分析器，每个结果附带该篇论文产生的事件
+# batched与parallel_map的同名参数一致；返回(func, initializer, initargs)，结果需要经过 collect 解包
+def wrap_worker(func, initializer=None, initargs=(), batched=False):
+    if _active is None:
+        return func, initializer, initargs
+    call = _profiled_batch_call if batched else _profiled_call
+    return partial(call, func), _profiled_initializer, (initializer, initargs, _active.track_memory, os.getpid())
+
+# 解包 wrap_worker 包装后的结果：合并事件，产出原来的结果
+def collect(results):
+    if _active is None:
+        yield from results
+        return
+    for result, events in results:
+        _active.merge(events)
+        yield result
@@ -0,0 +1,111 @@
+import os
+import io
+import gc
+import mmap
+import marshal
+import hashlib
+import logging
+
+from utils.lexicon import read_entries, coherence_category
+from utils.cache import file_digest
+
+# jieba词典快照
+# jieba每个进程第一次分词时都要从缓存重建前缀词典，jieba.posseg导入时还要逐行解析dict.txt得到词性表，合计一秒多。
+# 这里把前缀词典、词频总数和词性表（含dict/中的关联词和转述性标记）一次性用marshal序列化成快照文件，
+# 之后的进程直接反序列化快照，省去重建和解析的时间。
+# 快照反序列化后是每个进程私有的dict，文件本身并没有被映射共享：只有fork才能共享内存——主进程先加载快照（preload）
+# 并gc.freeze，fork出的子进程按写时复制共享这些内存页，不再各自加载；使用spawn启动子进程时（Windows、macOS的默认方式）
+# 每个子进程仍各自读入一份快照，只是比jieba原来的加载方式快。
+# 快照文件名包含版本号、jieba版本和自定义词表的哈希，任一改变都会生成新的快照。
+
+snapshot_version = 1
+snapshot_directory = './data/jieba/'
+
+# 自定义词的词性：关联词标为连词，转述性标记标为动词
+custom_word_tags = {coherence_category: 'c'}
+default_custom_tag = 'v'
+
+_loaded = None  # 当前进程已加载快照时使用的参数
+_posseg = None
+
+def custom_words(coherence_keywords_path, reporting_markers_path):
+    words = {}
+    for word, category in read_entries(coherence_keywords_path, reporting_markers_path):
+        if word and word not in words:
+            words[word] = custom_word_tags.get(category, default_custom_tag)
+    return sorted(words.items())
+
+def snapshot_path(directory, coherence_keywords_path, reporting_markers_path):
+    import jieba
+    key = hashlib.blake2b(f"{snapshot_version}|{jieba.__version__}|{file_digest(coherence_keywords_path)}|{file_digest(reporting_markers_path)}".encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(os.path.abspath(directory), f"jieba-{key}.snapshot")
+
+# 按jieba的正常流程加载词典并加入自定义词，然后写出快照；写完后当前进程的jieba已经可以直接使用
+def build_snapshot(path, words):
+    import jieba
+    import jieba.posseg
+
+    tokenizer = jieba.dt
+    tokenizer.initialize()
+    for word, tag in words:
+        # 词典中已有的词保持原样，只补充缺少的词
+        if not tokenizer.FREQ.get(word):
+            tokenizer.add_word(word, tag=tag)
+    tags = jieba.posseg.dt.word_tag_tab
+    tags.update(tokenizer.user_word_tag_tab)
+    tokenizer.user_word_tag_tab.clear()
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        marshal.dump((tokenizer.FREQ, tokenizer.total, tags), f)
+    os.replace(temp_path, path)
+
+# 用mmap只是为了避免先把整个文件读成bytes再反序列化；marshal.loads仍会在当前进程中构建完整的dict
+def _read_snapshot(path):
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return marshal.loads(mapped)
+
+# 导入jieba.posseg时它会立即解析dict.txt生成词性表；快照中已经有词性表，导入期间让它读一个空文件
+def _import_posseg(tokenizer):
+    import sys
+    if 'jieba.posseg' in sys.modules:
+        return sys.modules['jieba.posseg']
+    tokenizer.get_dict_file = lambda: io.BytesIO()
+    try:
+        import jieba.posseg
+    finally:
+        del tokenizer.get_dict_file
+    return jieba.posseg
+
+# 加载快照（不存在时先生成），返回jieba.posseg模块；同一进程中重复调用时直接返回，分词前可以放心调用
+# share为True时把加载的对象移出垃圾回收的跟踪范围（gc.freeze），fork出的子进程读取时不会因GC而复制内存页；
+# 这只对fork出的子进程有效，spawn出的子进程不继承主进程的内存
+def load_jieba(coherence_keywords_path, reporting_markers_path, directory=snapshot_directory, share=False):
+    global _loaded, _posseg
+    arguments = (coherence_keywords_path, reporting_markers_path, directory)
+    if _loaded == arguments:
+        if share:
+            gc.freeze()
+        return _posseg
+
+    import jieba
+    jieba.setLogLevel(logging.ERROR)
+    path = snapshot_path(directory, coherence_keywords_path, reporting_markers_path)
+
+    try:
+        freq, total, tags = _read_snapshot(path)
+    except (FileNotFoundError, ValueError, EOFError, TypeError):
+        build_snapshot(path, custom_words(coherence_keywords_path, reporting_markers_path))
+    else:
+        tokenizer = jieba.dt
+        with tokenizer.lock:
+            tokenizer.FREQ, tokenizer.total = freq, total
+            tokenizer.initialized = True
+        _import_posseg(tokenizer).dt.word_tag_tab = tags
+
+    import jieba.posseg
+    _loaded, _posseg = arguments, jieba.posseg
+    if share:
+        gc.freeze()
+    return _posseg
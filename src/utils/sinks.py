@@ -0,0 +1,167 @@
+import os
+import csv
+import json
+import math
+
+# 结果输出：每算完一篇论文就把结果行写出去，不在内存中保留全部结果
+# fields 为 [(字段名, 类型), ...]，类型为 'string'、'int' 或 'float'，决定输出哪些字段及列式文件的列类型
+# 文件格式由扩展名决定（.csv、.jsonl、.parquet、.arrow），也可以写成 “格式:路径”，例如 jsonl:- 表示输出到标准输出
+
+class Sink:
+    def write(self, row):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# 把结果中的一个值转换为普通Python值：numpy数值转为Python数值，
+# 特征函数用字符串'null'或NaN表示无法计算的值，这里都转为None（JSON中的null、CSV中的空值）
+def plain_value(value):
+    if hasattr(value, 'item'):
+        value = value.item()
+    if value == 'null' or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+# 把结果行转换为只含指定字段的普通Python值
+def to_record(row, fields):
+    return {name: plain_value(row.get(name)) for name, type in fields}
+
+def _open_text(path):
+    if path == '-':
+        return open(os.dup(1), 'w', encoding='utf-8', newline='')
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    return open(path, 'w', encoding='utf-8', newline='')
+
+class CsvSink(Sink):
+    def __init__(self, path, fields):
+        self.fields = fields
+        self.file = _open_text(path)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow([name for name, type in fields])
+
+    def write(self, row):
+        record = to_record(row, self.fields)
+        self.writer.writerow(['' if value is None else value for value in record.values()])
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class JsonlSink(Sink):
+    def __init__(self, path, fields):
+        self.fields = fields
+        self.file = _open_text(path)
+
+    def write(self, row):
+        self.file.write(json.dumps(to_record(row, self.fields), ensure_ascii=False) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+# 列式输出的公共部分：攒够row_group_size行后一次写出一个行组（Arrow的record batch）
+# pyarrow是可选依赖，只在使用这两种格式时才导入
+class _ColumnarSink(Sink):
+    def __init__(self, path, fields, row_group_size=10000):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise RuntimeError("输出Parquet或Arrow文件需要安装pyarrow：pip install pyarrow")
+        types = {'string': pa.string(), 'int': pa.int64(), 'float': pa.float64()}
+        self.pa = pa
+        self.path = path
+        self.fields = fields
+        self.schema = pa.schema([(name, types[type]) for name, type in fields])
+        self.row_group_size = row_group_size
+        self.columns = {name: [] for name, type in fields}
+        self.rows = 0
+        self.writer = None
+
+    def write(self, row):
+        for name, value in to_record(row, self.fields).items():
+            self.columns[name].append(value)
+        self.rows += 1
+        if self.rows >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows == 0:
+            return
+        batch = self.pa.RecordBatch.from_pydict(self.columns, schema=self.schema)
+        if self.writer is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self.writer = self.open_writer()
+        self.write_batch(batch)
+        self.columns = {name: [] for name in self.columns}
+        self.rows = 0
+
+    def close(self):
+        self.flush()
+        if self.writer is None:
+            # 没有任何结果时也输出一个只有表头的空文件
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self.writer = self.open_writer()
+        self.writer.close()
+
+class ParquetSink(_ColumnarSink):
+    def open_writer(self):
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(self.path, self.schema)
+
+    def write_batch(self, batch):
+        self.writer.write_table(self.pa.Table.from_batches([batch]))
+
+class ArrowSink(_ColumnarSink):
+    def open_writer(self):
+        return self.pa.ipc.new_file(self.path, self.schema)
+
+    def write_batch(self, batch):
+        self.writer.write_batch(batch)
+
+# 同时写入多个输出
+class MultiSink(Sink):
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def write(self, row):
+        for sink in self.sinks:
+            sink.write(row)
+
+    # 逐个关闭，某个输出出错时仍然关闭其余的输出，最后再抛出第一个错误
+    def close(self):
+        error = None
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                if error is None:
+                    error = e
+        if error is not None:
+            raise error
+
+sink_formats = {
+    'csv': CsvSink,
+    'jsonl': JsonlSink,
+    'parquet': ParquetSink,
+    'arrow': ArrowSink,
+}
+
+_extensions = {'.csv': 'csv', '.jsonl': 'jsonl', '.json': 'jsonl', '.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow'}
+
+# 根据 “格式:路径” 或文件扩展名创建输出
+def open_sink(spec, fields):
+    format, separator, path = spec.partition(':')
+    if not separator or format not in sink_formats:
+        path = spec
+        format = _extensions.get(os.path.splitext(spec)[1].lower())
+        if format is None:
+            raise ValueError(f"无法识别输出格式: '{spec}'，请使用 {', '.join(_extensions)} 扩展名，或写成 “格式:路径”")
+    return sink_formats[format](path, fields)
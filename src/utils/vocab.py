@@ -0,0 +1,50 @@
+import numpy as np
+
+# 把一篇论文的token序列转换成整数ID：返回(词表, ID数组)
+# 词表按词第一次出现的顺序排列，满足 types[ids[i]] == tokens[i]
+def intern_tokens(tokens):
+    index = {}
+    ids = np.fromiter((index.setdefault(token, len(index)) for token in tokens), dtype=np.int32, count=len(tokens))
+    return list(index), ids
+
+# 特征函数既可以接收token列表，也可以接收预处理得到的ID数组（此时需同时给出词表）
+def as_token_ids(tokens, token_types=None):
+    if isinstance(tokens, np.ndarray):
+        return tokens, token_types
+    types, ids = intern_tokens(tokens)
+    return ids, types
+
+# 语料级词表：在整个语料范围内给每个词分配唯一的int32 ID
+# 各进程先在单篇论文内部编号（intern_tokens），再由主进程通过remap合并到语料级词表
+class Vocabulary:
+    def __init__(self, words=()):
+        self.words = []
+        self.index = {}
+        for word in words:
+            self.add(word)
+
+    def __len__(self):
+        return len(self.words)
+
+    def add(self, word):
+        id = self.index.get(word)
+        if id is None:
+            id = self.index[word] = len(self.words)
+            self.words.append(word)
+        return id
+
+    # 返回一组词对应的语料级ID
+    def intern(self, words):
+        return np.fromiter((self.add(word) for word in words), dtype=np.int32, count=len(words))
+
+    # 把单篇论文内部的ID数组转换为语料级ID
+    def remap(self, token_types, token_ids):
+        return self.intern(token_types)[token_ids]
+
+    # 把预处理结果中的token ID改为语料级ID，此后该论文的词表就是语料级词表
+    def add_essay(self, essay):
+        essay.token_ids = self.remap(essay.token_types, essay.token_ids)
+        essay.token_types = self.words
+
+    def lookup(self, ids):
+        return [self.words[id] for id in ids]
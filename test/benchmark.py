@@ -0,0 +1,299 @@
+import sys
+import os
+import gc
+import json
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+import contextlib
+
+# 将 src 目录添加到系统路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '../src'))
+repository_root = os.path.dirname(project_root)
+sys.path.append(project_root)
+
+from synthetic_corpus import generate_corpus
+from utils.preprocessing import load_data, split_sentences, tokenize_with_pos, preprocess_in_advance, preprocess_essay, load_stop_words, stop_words_path, coherence_keywords_path, reporting_markers_path
+from utils.lexicon import load_lexicon
+from features.vocabulary import calculate_vocabulary_richness
+from features.syntax import analyze_syntax_complexity
+from features.coherence import evaluate_coherence
+from features.theme_relevance import score_theme_relevance, evaluate_theme_relevance
+from features.argument_strength import evaluate_argument_strength, analyze_argument_style, analyze_argument_style_batch, load_sentiment_model
+
+# 性能测试：分别测量读取XML、分句、分词、preprocess_in_advance以及各个特征函数的吞吐量和内存峰值
+# 结果以JSON Lines格式输出（第一行为运行环境，之后每个阶段一行），可以用 --compare 与之前的结果对比
+# 用法：python test/benchmark.py --papers 500 --output bench.jsonl
+#       python test/benchmark.py --papers 500 --compare bench.jsonl
+
+##### 各个阶段 #####
+# 每个阶段接收此前各阶段的结果ctx，返回(待计时的函数, 处理的字符数，load_data为XML文件的字节数)；输入数据在计时之外准备好，只测量函数本身
+# 函数的返回值以阶段名保存到ctx中，供后面的阶段使用
+
+def stage_load_data(ctx):
+    data_dir = ctx['data_dir']
+    size = sum(os.path.getsize(os.path.join(data_dir, name)) for name in os.listdir(data_dir) if name.endswith('.xml'))
+    return lambda: list(load_data(data_dir).values()), size
+
+def stage_split_sentences(ctx):
+    bodies = [essay.body for essay in ctx['load_data']]
+    return lambda: [split_sentences(body) for body in bodies], sum(map(len, bodies))
+
+def stage_tokenize(ctx):
+    texts = [text for sentences, text in ctx['split_sentences']]
+    model = ctx['model']
+    return lambda: [tokenize_with_pos(text, model) for text in texts], sum(map(len, texts))
+
+def stage_preprocess_in_advance(ctx):
+    inputs = []
+    for (sentences, text), tagged in zip(ctx['split_sentences'], ctx['tokenize']):
+        words = [word for word, flag in tagged]
+        flags = [flag for word, flag in tagged]
+        inputs.append((words, flags, len(text.replace(' ', ''))))
+    return lambda: [preprocess_in_advance(*args) for args in inputs], sum(len(text) for sentences, text in ctx['split_sentences'])
+
+# 完整的单篇预处理（含分词），其结果作为各特征函数的输入
+def stage_preprocess_essay(ctx):
+    essays = ctx['load_data']
+    stop_words = load_stop_words(stop_words_path)
+    model = ctx['model']
+    return lambda: [preprocess_essay(essay, stop_words, model) for essay in essays], sum(len(essay.body) for essay in essays)
+
+def _feature_inputs(ctx, fields):
+    essays = ctx['preprocess_essay']
+    inputs = [tuple(getattr(essay, field) for field in fields) for essay in essays]
+    return inputs, sum(len(essay.text) for essay in essays)
+
+def stage_vocabulary_richness(ctx):
+    inputs, size = _feature_inputs(ctx, ('token_ids',))
+    return lambda: [calculate_vocabulary_richness(*args) for args in inputs], size
+
+def stage_syntax_complexity(ctx):
+    inputs, size = _feature_inputs(ctx, ('sentences',))
+    return lambda: [analyze_syntax_complexity(*args) for args in inputs], size
+
+def stage_coherence(ctx):
+    inputs, size = _feature_inputs(ctx, ('tokens', 'coherence_words'))
+    return lambda: [evaluate_coherence(*args) for args in inputs], size
+
+def stage_theme_relevance(ctx):
+    inputs, size = _feature_inputs(ctx, ('title', 'abstract', 'keywords', 'sentences', 'sentence_tokens'))
+    return lambda: [score_theme_relevance(*args) for args in inputs], size
+
+# evaluate_theme_relevance是旧接口（标题和关键词两项）的兼容包装，内部与score_theme_relevance使用同一实现
+def stage_theme_relevance_compat(ctx):
+    inputs, size = _feature_inputs(ctx, ('title', 'keywords', 'sentences', 'sentence_tokens'))
+    return lambda: [evaluate_theme_relevance(*args) for args in inputs], size
+
+def stage_argument_strength(ctx):
+    inputs, size = _feature_inputs(ctx, ('token_ids', 'sentences', 'token_types'))
+    return lambda: [evaluate_argument_strength(*args) for args in inputs], size
+
+def stage_argument_style(ctx):
+    inputs, size = _feature_inputs(ctx, ('sentences', 'sentence_tokens'))
+    sentences = [args[0] for args in inputs]
+    sentence_tokens = [args[1] for args in inputs]
+    return lambda: analyze_argument_style_batch(sentences, sentence_tokens), size
+
+# 逐句调用SnowNLP的旧实现，速度很慢，只在 --stages 中明确指定时运行
+def stage_argument_style_legacy(ctx):
+    inputs, size = _feature_inputs(ctx, ('sentences',))
+    return lambda: [analyze_argument_style(*args) for args in inputs], size
+
+# (阶段名, 阶段函数, 依赖的阶段, 是否默认运行)
+stages = [
+    ('load_data', stage_load_data, (), True),
+    ('split_sentences', stage_split_sentences, ('load_data',), True),
+    ('tokenize', stage_tokenize, ('split_sentences',), True),
+    ('preprocess_in_advance', stage_preprocess_in_advance, ('tokenize',), True),
+    ('preprocess_essay', stage_preprocess_essay, ('load_data',), True),
+    ('vocabulary_richness', stage_vocabulary_richness, ('preprocess_essay',), True),
+    ('syntax_complexity', stage_syntax_complexity, ('preprocess_essay',), True),
+    ('coherence', stage_coherence, ('preprocess_essay',), True),
+    ('theme_relevance', stage_theme_relevance, ('preprocess_essay',), True),
+    ('theme_relevance_compat', stage_theme_relevance_compat, ('preprocess_essay',), True),
+    ('argument_strength', stage_argument_strength, ('preprocess_essay',), True),
+    ('argument_style', stage_argument_style, ('preprocess_essay',), True),
+    ('argument_style_legacy', stage_argument_style_legacy, ('preprocess_essay',), False),
+]
+
+# 根据用户指定的阶段补全其依赖的阶段，按定义顺序返回
+def select_stages(names=None):
+    definitions = {name: (function, requires) for name, function, requires, default in stages}
+    if names is None:
+        wanted = {name for name, function, requires, default in stages if default}
+    else:
+        unknown = set(names) - set(definitions)
+        if unknown:
+            raise ValueError(f"未知的阶段: {', '.join(sorted(unknown))}")
+        wanted = set(names)
+    pending = list(wanted)
+    while pending:
+        for required in definitions[pending.pop()][1]:
+            if required not in wanted:
+                wanted.add(required)
+                pending.append(required)
+    return [(name, function, name in (names or wanted)) for name, function, requires, default in stages if name in wanted]
+
+##### 计时与内存 #####
+# 运行repeat次，返回(最后一次的结果, 每次的用时)
+def time_call(function, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+# 用tracemalloc测量一次调用期间Python分配的内存峰值（字节，含numpy数组）
+# tracemalloc会明显拖慢运行速度，所以与计时分开单独运行一次
+def peak_memory(function):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+# 预先加载分词词典、词表和情感模型，避免一次性的初始化开销计入第一个阶段
+def warm_up(model):
+    # jieba的词典由tokenize_with_pos从词典快照加载（见utils.segmenter），不再另外加载默认词典
+    tokenize_with_pos('预热', model)
+    load_lexicon(coherence_keywords_path, reporting_markers_path)
+    load_sentiment_model()
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=repository_root, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def run_benchmark(data_dir, model='jieba', stage_names=None, repeat=3, measure_memory=True):
+    ctx = {'data_dir': data_dir, 'model': model}
+    warm_up(model)
+
+    records = []
+    for name, stage, report in select_stages(stage_names):
+        function, size = stage(ctx)
+        result, timings = time_call(function, repeat)
+        ctx[name] = result
+        if not report:
+            continue
+
+        papers = len(ctx['load_data']) if name != 'load_data' else len(result)
+        best = min(timings)
+        records.append({
+            'type': 'stage',
+            'stage': name,
+            'papers': papers,
+            'chars': size,
+            'repeat': repeat,
+            'best_seconds': round(best, 6),
+            'median_seconds': round(statistics.median(timings), 6),
+            'papers_per_second': round(papers / best, 2) if best > 0 else None,
+            'chars_per_second': round(size / best, 1) if best > 0 else None,
+            'peak_memory_bytes': peak_memory(function) if measure_memory else None,
+        })
+        yield records[-1]
+
+def environment(data_dir, model, args):
+    return {
+        'type': 'meta',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'model': model,
+        'data_dir': data_dir,
+        'papers': args.papers if args.data is None else None,
+        'seed': args.seed,
+        'repeat': args.repeat,
+    }
+
+##### 输出与对比 #####
+def print_record(record, baseline=None):
+    memory = record['peak_memory_bytes']
+    memory = f"{memory / 1024 / 1024:9.2f} MB" if memory is not None else f"{'-':>12}"
+    line = f"{record['stage']:<24}{record['best_seconds']:>10.4f} s{record['papers_per_second'] or 0:>12.1f} 篇/秒{(record['chars_per_second'] or 0) / 1e6:>9.3f} M字/秒{memory}"
+    if baseline is not None:
+        line += f"  {record['best_seconds'] / baseline['best_seconds']:>6.2f}x" if baseline['best_seconds'] > 0 else ''
+    print(line, file=sys.stderr)
+
+def read_records(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return {record['stage']: record for record in records if record.get('type') == 'stage'}
+
+# 与基准结果对比：用时超过基准的(1 + threshold)倍即视为性能退化
+def find_regressions(records, baseline, threshold):
+    regressions = []
+    for record in records:
+        previous = baseline.get(record['stage'])
+        if previous is None or previous['best_seconds'] <= 0:
+            continue
+        ratio = record['best_seconds'] / previous['best_seconds']
+        if ratio > 1 + threshold:
+            regressions.append((record['stage'], ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="分阶段测量预处理和特征计算的吞吐量与内存峰值")
+    parser.add_argument('--data', help="使用已有的语料目录；不指定时自动生成合成语料")
+    parser.add_argument('-n', '--papers', type=int, default=200, help="合成语料的论文篇数")
+    parser.add_argument('--files', type=int, default=1, help="合成语料的XML文件个数")
+    parser.add_argument('--seed', type=int, default=0, help="合成语料的随机种子")
+    parser.add_argument('--model', default='jieba', help="分词模型：jieba、hanlp或snownlp")
+    parser.add_argument('--stages', nargs='+', help=f"只运行指定的阶段（自动包含其依赖）：{', '.join(name for name, *rest in stages)}")
+    parser.add_argument('--repeat', type=int, default=3, help="每个阶段重复运行的次数，取最短用时")
+    parser.add_argument('--no-memory', action='store_true', help="不测量内存峰值")
+    parser.add_argument('-o', '--output', help="把结果写入JSON Lines文件（默认输出到标准输出）")
+    parser.add_argument('--compare', help="与之前保存的JSON Lines结果对比")
+    parser.add_argument('--threshold', type=float, default=0.2, help="对比时允许的最大变慢比例，超过则返回非零退出码")
+    args = parser.parse_args()
+
+    baseline = read_records(args.compare) if args.compare else None
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+
+    # 词表等路径相对于仓库根目录
+    data_root = os.path.abspath(args.data) if args.data else None
+    os.chdir(repository_root)
+
+    with tempfile.TemporaryDirectory(prefix='uawa-bench-') as temporary:
+        data_dir = data_root or temporary
+        if data_root is None:
+            generate_corpus(data_dir, args.papers, args.files, args.seed)
+
+        meta = environment(data_dir if data_root else None, args.model, args)
+        output.write(json.dumps(meta, ensure_ascii=False) + '\n')
+
+        # 被测函数自身的打印信息转到标准错误，标准输出只保留JSON结果
+        records = []
+        with contextlib.redirect_stdout(sys.stderr):
+            for record in run_benchmark(data_dir, args.model, args.stages, args.repeat, not args.no_memory):
+                output.write(json.dumps(record, ensure_ascii=False) + '\n')
+                output.flush()
+                print_record(record, baseline.get(record['stage']) if baseline else None)
+                records.append(record)
+
+    if output is not sys.stdout:
+        output.close()
+
+    if baseline is not None:
+        regressions = find_regressions(records, baseline, args.threshold)
+        for stage, ratio in regressions:
+            print(f"性能退化: {stage} 用时为基准的 {ratio:.2f} 倍", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
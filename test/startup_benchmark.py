@@ -0,0 +1,87 @@
+import sys
+import os
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+# 启动时间测试：在全新的Python进程中测量从启动到算完第一篇论文所需的时间
+# 分为 interpreter（解释器启动）、import（导入main及其依赖）、init（加载停用词和分词词典）、first_essay（预处理并计算第一篇论文的特征）
+# 结果与benchmark.py一样以JSON Lines格式输出
+# 用法：python test/startup_benchmark.py --repeat 5
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '../src'))
+repository_root = os.path.dirname(project_root)
+
+# 子进程：只导入标准库，依次计时各阶段
+def child(path, model):
+    start = time.perf_counter()
+    sys.path.append(project_root)
+    os.chdir(repository_root)
+
+    import main
+    from utils.preprocessing import iter_file_papers, init_worker, preprocess_worker
+    imported = time.perf_counter()
+
+    init_worker(main.stop_words_path, model)
+    initialized = time.perf_counter()
+
+    item = next(iter_file_papers(path))
+    id, essay = preprocess_worker(item)
+    main.extract_features(essay)
+    finished = time.perf_counter()
+
+    print(json.dumps({
+        'import': imported - start,
+        'init': initialized - imported,
+        'first_essay': finished - initialized,
+        'modules': len(sys.modules),
+    }))
+
+def measure(path, model):
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', path, '--model', model], capture_output=True, text=True, check=True).stdout
+    total = time.perf_counter() - start
+    phases = json.loads(output.strip().splitlines()[-1])
+    phases['total'] = total
+    phases['interpreter'] = total - phases['import'] - phases['init'] - phases['first_essay']
+    return phases
+
+def main():
+    parser = argparse.ArgumentParser(description="测量从进程启动到算完第一篇论文的时间")
+    parser.add_argument('--repeat', type=int, default=5, help="重复启动的次数，报告中位数")
+    parser.add_argument('--model', default='jieba', help="分词模型")
+    parser.add_argument('-o', '--output', help="把结果写入JSON Lines文件（默认输出到标准输出）")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.model)
+        return
+
+    sys.path.append(project_root)
+    from synthetic_corpus import generate_corpus
+
+    with tempfile.TemporaryDirectory(prefix='uawa-startup-') as temporary:
+        path = generate_corpus(temporary, 1)[0]
+        # 第一次运行会生成jieba的词典缓存等，不计入结果
+        measure(path, args.model)
+        runs = [measure(path, args.model) for _ in range(args.repeat)]
+
+    record = {'type': 'startup', 'model': args.model, 'repeat': args.repeat, 'modules': runs[-1]['modules']}
+    for phase in ('interpreter', 'import', 'init', 'first_essay', 'total'):
+        record[f'{phase}_seconds'] = round(statistics.median(run[phase] for run in runs), 4)
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    output.write(json.dumps(record, ensure_ascii=False) + '\n')
+    if output is not sys.stdout:
+        output.close()
+
+    for phase in ('interpreter', 'import', 'init', 'first_essay', 'total'):
+        print(f"{phase:<14}{record[f'{phase}_seconds']:>8.3f} s", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import sys
+import os
+import random
+import argparse
+from xml.sax.saxutils import escape
+
+# 将 src 目录添加到系统路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '../src'))
+sys.path.append(project_root)
+
+from utils.lexicon import read_entries, coherence_category
+
+# 合成语料生成器：按 load_data 所需的 <Paper> 结构生成指定规模的中文论文XML，用于性能测试
+# 正文由主题词、关联词、转述性标记和固定句式随机拼接而成，不追求语义通顺，只保证各预处理和特征函数都有事可做
+
+dict_directory = os.path.abspath(os.path.join(project_root, '..', 'dict'))
+coherence_keywords_path = os.path.join(dict_directory, 'coherence_keywords.txt')
+reporting_markers_path = os.path.join(dict_directory, 'reporting markers.xml')
+
+# 主题：(标题中的作品, 课程, 主题词)
+topics = [
+    ('《洛神赋》', '中国古代文学', ['曹植', '洛神', '情感', '寄托', '抒情', '意象', '辞赋', '创作动机']),
+    ('《红楼梦》', '中国古代文学', ['贾宝玉', '林黛玉', '大观园', '人物形象', '叙事', '悲剧', '家族', '诗词']),
+    ('《边城》', '中国现当代文学', ['沈从文', '湘西', '翠翠', '乡土', '人性', '自然', '抒情小说', '牧歌']),
+    ('《呐喊》', '中国现当代文学', ['鲁迅', '国民性', '启蒙', '小说', '批判', '知识分子', '乡村', '反讽']),
+    ('汉语方言', '现代汉语', ['语音', '声调', '词汇', '语法', '方言', '普通话', '调查', '语料']),
+    ('古汉语虚词', '古代汉语', ['虚词', '训诂', '句法', '语义', '语法化', '先秦', '文献', '用例']),
+    ('《诗经》', '中国古代文学', ['风雅颂', '比兴', '重章叠句', '四言', '周代', '礼乐', '民歌', '意象']),
+    ('文学理论', '文学概论', ['文本', '读者', '接受', '审美', '形式', '意义', '阐释', '结构']),
+]
+
+# 句式模板：{t} 主题词，{m} 转述性标记，{c} 关联词
+templates = [
+    '{c}，{t}在文本中具有重要的地位，{t}与{t}之间的关系值得进一步{m}。',
+    '有学者{m}，{t}不仅体现了作者的思想，{c}反映了{t}的时代特征。',
+    '本文{m}了{t}的表现方式，{c}从{t}的角度加以讨论。',
+    '{t}的形成与{t}密切相关，{c}我们需要结合{t}来理解。',
+    '{c}，{t}的意义并不单一，它往往与{t}交织在一起。',
+    '前人研究{m}，{t}是理解{t}的关键所在。',
+    '从{t}来看，作者对{t}的处理十分细致，{c}形成了独特的风格。',
+    '{t}与{t}的对照，使文本呈现出丰富的层次！',
+    '我们{m}，{t}的问题{c}涉及{t}，{c}也牵涉到{t}。',
+    '{t}为何会成为研究的重点？{c}这与{t}的特殊性有关。',
+]
+
+def load_word_lists():
+    coherence_words, marker_words = [], []
+    for word, category in read_entries(coherence_keywords_path, reporting_markers_path):
+        if not word:
+            continue
+        (coherence_words if category == coherence_category else marker_words).append(word)
+    return coherence_words, marker_words
+
+def make_sentence(rng, topic_words, coherence_words, marker_words):
+    template = rng.choice(templates)
+    parts = template.split('{')
+    sentence = parts[0]
+    for part in parts[1:]:
+        kind, rest = part[0], part[2:]
+        if kind == 't':
+            sentence += rng.choice(topic_words)
+        elif kind == 'm':
+            sentence += rng.choice(marker_words)
+        else:
+            sentence += rng.choice(coherence_words)
+        sentence += rest
+    return sentence
+
+# 生成一篇论文的XML；paragraphs为段落数范围，sentences为每段句子数范围
+def make_paper(rng, id, coherence_words, marker_words, paragraphs=(8, 20), sentences=(3, 8)):
+    work, curriculum, topic_words = rng.choice(topics)
+    focus = rng.sample(topic_words, 3)
+    title = f'论{work}中的{focus[0]}与{focus[1]}'
+    keywords = '；'.join([work.strip('《》')] + focus)
+    abstract = ''.join(make_sentence(rng, topic_words, coherence_words, marker_words) for _ in range(3))
+    body = '\n'.join(
+        ''.join(make_sentence(rng, topic_words, coherence_words, marker_words) for _ in range(rng.randint(*sentences)))
+        for _ in range(rng.randint(*paragraphs))
+    )
+    return (
+        f'<Paper><ID>{id}</ID>'
+        f'<Metadata><Title>{escape(title)}</Title><Author>作者{rng.randint(1, 200)}</Author><Curriculum>{curriculum}</Curriculum>'
+        f'<Year>{rng.randint(2018, 2024)}</Year><Month>{rng.randint(1, 12)}</Month><Day>{rng.randint(1, 28)}</Day></Metadata>'
+        f'<Abstract>{escape(abstract)}</Abstract><Keywords>{escape(keywords)}</Keywords>'
+        f'<Body>{escape(body)}</Body><Reference></Reference></Paper>'
+    )
+
+# 生成num_papers篇论文，平均分到num_files个XML文件中；相同的seed总是生成相同的语料
+# 返回生成的文件路径列表
+def generate_corpus(output_dir, num_papers, num_files=1, seed=0, paragraphs=(8, 20), sentences=(3, 8)):
+    rng = random.Random(seed)
+    coherence_words, marker_words = load_word_lists()
+    os.makedirs(output_dir, exist_ok=True)
+
+    paths = []
+    id = 1
+    for index in range(num_files):
+        count = num_papers // num_files + (1 if index < num_papers % num_files else 0)
+        path = os.path.join(output_dir, f'synthetic_{index}.xml')
+        # 逐篇写入，语料规模不受内存限制
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("<?xml version='1.0' encoding='utf-8'?>\n<Corpus>\n<Header><Title>Synthetic Corpus</Title></Header>\n<Papers>\n")
+            for _ in range(count):
+                f.write(make_paper(rng, id, coherence_words, marker_words, paragraphs, sentences))
+                f.write('\n')
+                id += 1
+            f.write('</Papers>\n</Corpus>\n')
+        paths.append(path)
+    return paths
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="生成合成的中文论文语料（XML）")
+    parser.add_argument('output_dir', help="输出目录")
+    parser.add_argument('-n', '--papers', type=int, default=1000, help="论文篇数")
+    parser.add_argument('-f', '--files', type=int, default=1, help="XML文件个数")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    paths = generate_corpus(args.output_dir, args.papers, args.files, args.seed)
+    size = sum(os.path.getsize(path) for path in paths)
+    print(f"已生成 {args.papers} 篇论文，{len(paths)} 个文件，共 {size / 1024 / 1024:.2f} MB：{args.output_dir}")
@@ -103,17 +103,17 @@ def main():
     }
 
     for id, data in tqdm(preprocessed_essays.items(), desc="Processing papers", unit="papers", bar_format='{l_bar}{bar:40}{r_bar}', ncols=100):
-        fields = ['title', 'author', 'curriculum', 'date', 'abstract', 'keywords', 'tokens', 'sentences', 'coherence_words', 'coherence_parameters', 'word_count', 'frequencies_counts', 'realword_ratio']
-        title, author, curriculum, date, abstract, keywords, tokens, sentences, coherence_words, coherence_parameters, word_count, frequencies_counts, realword_ratio = (data[field] for field in fields)
+        fields = ['title', 'author', 'curriculum', 'date', 'abstract', 'keywords', 'token_ids', 'token_types', 'sentences', 'coherence_words', 'coherence_parameters', 'word_count', 'frequencies_counts', 'realword_ratio']
+        title, author, curriculum, date, abstract, keywords, token_ids, token_types, sentences, coherence_words, coherence_parameters, word_count, frequencies_counts, realword_ratio = (getattr(data, field) for field in fields)
 
         # 仅处理目标作者的论文
         if author == target_author:
-            vocab_richness = calculate_vocabulary_richness(tokens)[3]
+            vocab_richness = calculate_vocabulary_richness(token_ids)[3]
             syntax_complexity, clause_density = analyze_syntax_complexity(sentences)
             relevance_score = (evaluate_theme_relevance(title, keywords, sentences)[0] + 10 * evaluate_theme_relevance(abstract, keywords, sentences)[1]) / 2
 
-            keywords, words_coverage_ratio, sentence_coverage_ratio, passage_coverage_ratio = evaluate_argument_strength(tokens, sentences)
-            keyratio_score = evaluate_argument_strength(tokens, sentences)[2]  # 也就是words_coverage_ratio
+            keywords, words_coverage_ratio, sentence_coverage_ratio, passage_coverage_ratio = evaluate_argument_strength(token_ids, sentences, token_types)
+            keyratio_score = evaluate_argument_strength(token_ids, sentences, token_types)[2]  # 也就是words_coverage_ratio
 
             # 存储指标
             all_metrics["word_count"].append(word_count)